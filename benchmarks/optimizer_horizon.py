@@ -0,0 +1,41 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Add the src directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from optimizer import AdvancedMicroGridOptimizer
+
+HORIZONS = [24, 96, 288]
+SOLVERS = ['slsqp', 'lp']
+REPEATS = 3
+
+def make_problem(n_periods):
+    """Synthetic solar/load/price profile repeating daily over the horizon"""
+    hours = np.arange(n_periods) % 24
+    solar = np.maximum(0, 3.0 * np.sin(np.pi * (hours + 6) / 15))
+    load = 0.8 + 2.0 * np.exp(-0.5 * ((hours - 19) / 3) ** 2)
+    prices = np.where((hours < 8) | (hours >= 22), 0.12, np.where(hours < 18, 0.15, 0.20))
+    return solar, load, prices
+
+def run_benchmark():
+    print("=== Optimizer solve time vs horizon length ===")
+    optimizer = AdvancedMicroGridOptimizer()
+
+    for solver in SOLVERS:
+        for n_periods in HORIZONS:
+            solar, load, prices = make_problem(n_periods)
+            timings = []
+
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                optimizer.multi_objective_optimization(solar, load, 50, prices, solver=solver)
+                timings.append(time.perf_counter() - start)
+
+            print(f"{solver:>5} horizon {n_periods:4d}: best {min(timings) * 1000:9.2f} ms, "
+                  f"mean {np.mean(timings) * 1000:9.2f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,404 @@
+"""
+Reproducible performance suite for the digital twin's hot paths.
+
+    python benchmarks/suite.py                                  # run all groups, write results JSON
+    python benchmarks/suite.py --only optimizer forecast        # some groups
+    python benchmarks/suite.py --update-baseline                # save this run as the baseline
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.25
+
+Runs offline with fixed seeds in a throwaway working directory (models are trained there,
+never in the repository). Times are the best of several repeats in seconds, after a
+warm-up call, so structure caches and loaded models count as steady state unless a case
+says 'cold'. With a baseline, a case regresses when it is more than `threshold` slower
+and slower by more than `floor` seconds, or when its success rate drops; the exit code
+is 1 if anything regressed. Baselines are only comparable on the same machine.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+# Add the src directory to Python path
+sys.path.append(os.path.join(REPO_DIR, 'src'))
+
+from optimizer_horizon import make_problem
+
+SEED = 42
+START = pd.Timestamp('2024-06-01 06:00')  # forecast/simulation start, fixed for reproducibility
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, 'results.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+# Optimizer grid; SLSQP at 288 periods takes seconds per solve, see optimizer_horizon.py
+HORIZONS = {'slsqp': [24, 96], 'lp': [24, 96, 288]}
+SOCS = [20, 50, 90]
+CARBON_COSTS = [0.0, 0.02, 0.2]
+
+SIMULATION_STEPS = [288, 8640]  # one day and one month of 5-minute steps
+HISTORY_LENGTHS = [1_000, 100_000, 1_000_000]  # dashboard history samples (1 s apart)
+RAW_FIGURE_LIMIT = 100_000  # longest history also plotted without downsampling, for reference
+
+GROUPS = {}
+
+def benchmark(group):
+    """Register a function returning {case name: measurement} under a group name"""
+    def register(function):
+        GROUPS[group] = function
+        return function
+    return register
+
+def measure(function, repeats=5, warmup=1, number=1):
+    """Best/median/mean seconds per call of function(), each repeat timing `number` calls"""
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        'seconds': min(times),
+        'median': float(np.median(times)),
+        'mean': float(np.mean(times)),
+        'repeats': repeats
+    }
+
+def seed_everything(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the progress prints of training and fallbacks"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+@contextlib.contextmanager
+def workspace():
+    """Temporary working directory with the plant model; forecasting models are trained into it"""
+    previous = os.getcwd()
+    directory = tempfile.mkdtemp(prefix='microgrid-bench-')
+    try:
+        os.makedirs(os.path.join(directory, 'models'))
+        shutil.copy(os.path.join(REPO_DIR, 'models', 'microgrid.mo'), os.path.join(directory, 'models'))
+        os.chdir(directory)
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+def trained_forecaster():
+    """Forecaster with models in the workspace, trained (untimed) on first use"""
+    from forecaster import AdvancedMicroGridForecaster
+
+    forecaster = AdvancedMicroGridForecaster()
+    if not forecaster.load_models():
+        with quiet():
+            forecaster.train_models(seed=SEED)
+    return forecaster
+
+@benchmark('optimizer')
+def bench_optimizer(quick=False):
+    """multi_objective_optimization over horizon x SOC x carbon weight, with success rates"""
+    from optimizer import AdvancedMicroGridOptimizer
+
+    results = {}
+    optimizer = AdvancedMicroGridOptimizer()
+    for solver, horizons in HORIZONS.items():
+        for n_periods in horizons[:2] if quick else horizons:
+            solar, load, prices = make_problem(n_periods)
+            statuses = []
+            for soc in SOCS:
+                for carbon_cost in CARBON_COSTS:
+                    def solve():
+                        optimizer.multi_objective_optimization(solar, load, soc, prices,
+                                                               carbon_cost=carbon_cost, solver=solver)
+                    with quiet():
+                        result = measure(solve, repeats=1 if quick else 3)
+                    result['status'] = optimizer.last_status
+                    statuses.append(optimizer.last_status)
+                    results[f"optimizer/{solver}/h{n_periods}/soc{soc}/carbon{carbon_cost}"] = result
+
+            results[f"optimizer/{solver}/h{n_periods}/success_rate"] = {
+                'success_rate': statuses.count('optimal') / len(statuses),
+                'fallback_rate': statuses.count('fallback') / len(statuses),
+                'solves': len(statuses)
+            }
+    return results
+
+@benchmark('forecast')
+def bench_forecast(quick=False):
+    """forecast() with the model artifacts loaded from disk (cold) and already in memory (warm)"""
+    from forecaster import AdvancedMicroGridForecaster
+    from model_registry import registry
+
+    trained_forecaster()
+
+    def cold():
+        registry.invalidate()
+        AdvancedMicroGridForecaster().forecast(start=START)
+
+    warm_forecaster = AdvancedMicroGridForecaster()
+    compiled_forecaster = AdvancedMicroGridForecaster(compiled=True)
+    repeats = 3 if quick else 5
+    return {
+        'forecast/cold': measure(cold, repeats=repeats, warmup=0),
+        'forecast/warm': measure(lambda: warm_forecaster.forecast(start=START), repeats=repeats, number=10),
+        'forecast/compiled_warm': measure(lambda: compiled_forecaster.forecast(start=START),
+                                          repeats=repeats, number=10)
+    }
+
+@benchmark('train')
+def bench_train(quick=False):
+    """train_models on the synthetic year of hourly data"""
+    from forecaster import AdvancedMicroGridForecaster
+
+    forecaster = AdvancedMicroGridForecaster()
+    with quiet():
+        return {'train/train_models': measure(lambda: forecaster.train_models(seed=SEED), repeats=1, warmup=0)}
+
+@benchmark('simulate')
+def bench_simulate(quick=False):
+    """simulate_step per call, and N-step runs stepped one by one vs simulate_batch"""
+    from clock import SimulatedClock
+    from modelica_interface import CSVModelicaInterface
+    from modelica_executor import NativeModelicaInterface
+
+    def daily_setpoints(n_steps):
+        # Charge by day, discharge by night (300 W peak), so the battery stays within its limits
+        battery_setpoint = 300 * np.sin(2 * np.pi * np.arange(n_steps) / 288)
+        return np.column_stack([battery_setpoint, np.zeros(n_steps)])
+
+    results = {}
+    plants = {'csv': CSVModelicaInterface, 'native': NativeModelicaInterface}
+    for name, plant_class in plants.items():
+        def new_plant():
+            return plant_class(os.path.join('models', 'microgrid.mo'), clock=SimulatedClock(START))
+
+        plant = new_plant()
+        profile = itertools.cycle(daily_setpoints(288))
+        results[f"simulate/{name}/step"] = measure(lambda: plant.simulate_step(*next(profile)), number=100)
+
+        for n_steps in SIMULATION_STEPS[:1] if quick else SIMULATION_STEPS:
+            setpoints = daily_setpoints(n_steps)
+            plant = new_plant()
+
+            def stepped():
+                for battery_setpoint, generator_setpoint in setpoints:
+                    plant.simulate_step(battery_setpoint, generator_setpoint)
+
+            results[f"simulate/{name}/stepped/{n_steps}"] = measure(stepped, repeats=3, warmup=0)
+            results[f"simulate/{name}/batch/{n_steps}"] = measure(lambda: plant.simulate_batch(setpoints), repeats=3)
+    return results
+
+@benchmark('fleet')
+def bench_fleet(quick=False):
+    """Fleet step across many sites, and whether a site reproduces the CSV plant"""
+    from clock import SimulatedClock
+    from fleet import MicroGridFleet
+    from modelica_interface import CSVModelicaInterface
+
+    results = {}
+    for n_sites in [100] if quick else [100, 10_000]:
+        fleet = MicroGridFleet(n_sites, clock=SimulatedClock(START))
+        setpoints = np.random.default_rng(SEED).uniform(-300, 300, n_sites)
+        results[f"fleet/step/{n_sites}"] = measure(lambda: fleet.step(setpoints, 0), number=10)
+
+    # Out-of-limit setpoints (W): battery beyond 5 kW and generator beyond 8 kW
+    setpoints = [(9000, 12000), (-9000, 0), (300, 0), (-7000, 9000)]
+    fleet = MicroGridFleet(1, clock=SimulatedClock(START))
+    plant = CSVModelicaInterface(os.path.join('models', 'microgrid.mo'), clock=SimulatedClock(START))
+    matches = []
+    for battery_setpoint, generator_setpoint in setpoints:
+        fleet.step(battery_setpoint, generator_setpoint)
+        state = plant.simulate_step(battery_setpoint, generator_setpoint)
+        matches.append(all(np.isclose(getattr(fleet, name)[0], state[name])
+                           for name in ['battery_soc', 'grid_power', 'total_cost_inr']))
+    results['fleet/matches_csv'] = {'success_rate': sum(matches) / len(matches), 'steps': len(matches)}
+    return results
+
+@benchmark('cycle')
+def bench_cycle(quick=False):
+    """run_optimization_cycle end to end, and whether a repeated cycle hits the solution cache"""
+    from clock import SimulatedClock
+    from main import AdvancedMicroGridDigitalTwin
+
+    trained_forecaster()
+    with quiet():
+        twin = AdvancedMicroGridDigitalTwin(clock=SimulatedClock(START))
+        results = {'cycle/run_optimization_cycle': measure(twin.run_optimization_cycle, repeats=5 if quick else 20)}
+
+        # The same cycle again (same instant and SOC) must be served from the solution cache
+        clock = SimulatedClock(START)
+        twin = AdvancedMicroGridDigitalTwin(clock=clock)
+        state = dict(twin.current_state)
+        cached = []
+        for _ in range(3 if quick else 10):
+            clock.current, twin.current_state = START, dict(state)
+            twin.run_optimization_cycle()
+            cached.append(twin.controller.cycle_stats[-1]['cached'])
+        results['cycle/repeated/cache'] = {
+            'success_rate': sum(cached[1:]) / len(cached[1:]),
+            'hit_rate': twin.optimizer.solution_cache.hit_rate,
+            'cycles': len(cached)
+        }
+    return results
+
+@benchmark('dashboard')
+def bench_dashboard(quick=False):
+    """
+    Dashboard work per tick against history length: the streamed update, a full figure
+    build, and zoomed views served from the downsampling pyramid. Plotting the raw
+    history (no downsampling) is included up to RAW_FIGURE_LIMIT samples for reference.
+    """
+    import plotly.io as pio
+
+    os.environ.pop('MICROGRID_BUS', None)  # always the built-in simulation
+    import dashboard
+
+    results = {}
+    for length in HISTORY_LENGTHS[:2] if quick else HISTORY_LENGTHS:
+        # length seconds of history before the simulator's live window
+        source = dashboard.DashboardSimulator()
+        source.pyramid = dashboard.EnvelopePyramid(dashboard.HISTORY_COLUMNS, window=dashboard.RAW_WINDOW)
+        times = np.datetime64(START, 'ns').view(np.int64) + np.arange(length, dtype=np.int64) * 10**9
+        rng = np.random.default_rng(SEED)
+        history = {name: rng.normal(1000, 100, length) for name in dashboard.HISTORY_COLUMNS}
+        source.pyramid.append(times, history)
+        for _ in range(dashboard.MAX_POINTS):
+            source.step()
+        dashboard.source = source
+        snapshot = source.latest()
+
+        def update():
+            dashboard.update_dashboard(0, snapshot.sequence - 1, None, None)
+
+        def figures():
+            pio.to_json(dashboard.make_power_figure(snapshot.history))
+            pio.to_json(dashboard.make_cost_figure(snapshot.history))
+
+        full_range = [str(pd.Timestamp(int(times[0]))), str(pd.Timestamp(int(times[-1])))]
+        day_range = [str(pd.Timestamp(int(times[-1])) - pd.Timedelta(days=1)), full_range[1]]
+
+        def zoom(view):
+            return lambda: dashboard.view_patch(view, dashboard.POWER_COLUMNS, ('xaxis', 'xaxis2')).to_plotly_json()
+
+        results[f"dashboard/update_dashboard/{length}"] = measure(update, number=10)
+        results[f"dashboard/figures/{length}"] = measure(figures)
+        results[f"dashboard/zoom_all/{length}"] = measure(zoom(full_range))
+        results[f"dashboard/zoom_day/{length}"] = measure(zoom(day_range))
+        if length <= RAW_FIGURE_LIMIT:
+            raw = dict(history, timestamp=times.view('datetime64[ns]'))
+            results[f"dashboard/raw_figures/{length}"] = measure(
+                lambda: pio.to_json(dashboard.make_power_figure(raw)), repeats=3
+            )
+        source.stop()
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    import scipy
+    import sklearn
+
+    return {
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'seed': SEED
+    }
+
+def run(groups, quick=False):
+    """Run the selected groups in a fresh workspace; returns the results document"""
+    results = {}
+    with workspace():
+        for group in groups:
+            seed_everything()
+            start = time.perf_counter()
+            results.update(GROUPS[group](quick=quick))
+            print(f"{group}: {time.perf_counter() - start:.1f}s")
+    return {'meta': dict(environment(), groups=list(groups), quick=quick), 'results': results}
+
+def compare(document, baseline, threshold=0.25, floor=0.0005):
+    """Print current vs baseline per case; returns the names of the regressed cases"""
+    regressions = []
+    if baseline['meta'].get('platform') != document['meta']['platform'] or \
+            baseline['meta'].get('cpu_count') != document['meta']['cpu_count']:
+        print("Warning: baseline was recorded on a different machine")
+
+    print(f"{'case':<55} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, current in document['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        if 'seconds' in current and 'seconds' in previous:
+            ratio = current['seconds'] / previous['seconds'] if previous['seconds'] > 0 else float('inf')
+            regressed = ratio > 1 + threshold and current['seconds'] - previous['seconds'] > floor
+            print(f"{name:<55} {previous['seconds'] * 1000:10.3f}ms {current['seconds'] * 1000:10.3f}ms "
+                  f"{ratio:6.2f}x{'  REGRESSED' if regressed else ''}")
+        elif 'success_rate' in current and 'success_rate' in previous:
+            regressed = current['success_rate'] < previous['success_rate']
+            print(f"{name:<55} {previous['success_rate']:12.0%} {current['success_rate']:12.0%}"
+                  f"{'         REGRESSED' if regressed else ''}")
+        else:
+            continue
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(GROUPS), help="groups to run (default: all)")
+    parser.add_argument('--quick', action='store_true', help="smaller grids and fewer repeats")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help=f"also save the results to {DEFAULT_BASELINE}")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown ratio (0.25 = 25%%)")
+    parser.add_argument('--floor', type=float, default=0.0005, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args(argv)
+
+    document = run(args.only or list(GROUPS), quick=args.quick)
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.update_baseline:
+        shutil.copy(args.output, DEFAULT_BASELINE)
+        print(f"Baseline saved to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(document, baseline, args.threshold, args.floor)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -66,7 +66,7 @@ def run_demo():
     # Show summary statistics in INR
     if not digital_twin.historical_data.empty:
         print("\n=== Summary Statistics ===")
-        print(f"Total cost: ₹{digital_twin.historical_data['total_cost_inr'].sum():.2f}")
+        print(f"Total cost: ₹{digital_twin.historical_data['total_cost_inr'].iloc[-1]:.2f}")
         print(f"Total carbon emissions: {digital_twin.historical_data['carbon_emissions'].sum():.3f} kgCO₂")
         print("Reliability events:")
         print(digital_twin.historical_data['reliability_status'].value_counts())
@@ -0,0 +1,198 @@
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+
+from optimizer import AdvancedMicroGridOptimizer
+
+# Per-process optimizer, rebuilt only when the parent's settings change
+_worker_optimizer = None
+_worker_settings = None
+
+def _attach(name):
+    """
+    Attach to a shared memory block owned (and unlinked) by the parent process.
+    Pool workers share the parent's resource tracker, so registering again is harmless.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def _solve_chunk(problems_name, plans_name, shape, indices, settings, solver, carbon_cost, timeout):
+    """
+    Worker: solve the problems at the given row indices.
+    Problem rows are [solar | load | prices | soc]; plans are written back as
+    [battery_power | generator_power]. Only (index, status, solve_time) travels by pickle.
+    """
+    global _worker_optimizer, _worker_settings
+    if _worker_settings != settings:
+        _worker_optimizer = AdvancedMicroGridOptimizer()
+        vars(_worker_optimizer).update(settings)
+        _worker_settings = settings
+
+    n_problems, n_periods = shape
+    problems_shm = _attach(problems_name)
+    plans_shm = _attach(plans_name)
+    try:
+        problems = np.ndarray((n_problems, 3 * n_periods + 1), dtype=np.float64, buffer=problems_shm.buf)
+        plans = np.ndarray((n_problems, 2 * n_periods), dtype=np.float64, buffer=plans_shm.buf)
+
+        results = []
+        for index in indices:
+            row = problems[index]
+            solar, load = row[:n_periods], row[n_periods:2 * n_periods]
+            prices, soc = row[2 * n_periods:3 * n_periods], row[-1]
+
+            start = time.perf_counter()
+            if solver == 'lp':
+                result = _worker_optimizer.solve_lp(solar, load, soc, prices, carbon_cost, time_limit=timeout)
+                success = result.status == 0
+            else:
+                result = _worker_optimizer.solve_slsqp(solar, load, soc, prices, carbon_cost, time_limit=timeout)
+                success = result.success
+            solve_time = time.perf_counter() - start
+
+            if success:
+                plans[index] = result.x[:2 * n_periods]
+                status = 'optimal'
+            else:
+                # Fallback to simple optimization, as multi_objective_optimization does
+                battery_power, generator_power = _worker_optimizer.simple_optimization(solar, load, soc, prices)
+                plans[index] = np.concatenate([battery_power, generator_power])
+                status = 'timeout' if timeout is not None and solve_time >= timeout else 'fallback'
+            results.append((index, status, solve_time))
+        return results
+    finally:
+        del problems, plans
+        problems_shm.close()
+        plans_shm.close()
+
+class BatchOptimizer:
+    """
+    Solve many independent dispatch problems (sites x scenarios) on a process pool.
+    Problem data and plans live in shared memory, so only indices and statuses are
+    pickled; per-task time limits are enforced by the solvers themselves.
+    """
+    def __init__(self, optimizer=None, max_workers=None, solver='lp', timeout=10.0, chunks_per_worker=4):
+        self.optimizer = AdvancedMicroGridOptimizer() if optimizer is None else optimizer
+        self.max_workers = max_workers or os.cpu_count()
+        self.solver = solver
+        self.timeout = timeout
+        self.chunks_per_worker = chunks_per_worker
+        self.last_report = {}
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _settings(self):
+        """Public optimizer parameters forwarded to the workers"""
+        return dict(self.optimizer._parameters())
+
+    def iter_solve(self, solar, load, soc, prices, carbon_cost=0.02):
+        """
+        Solve problem k = (solar[k], load[k], soc[k], prices[k]) for every k, yielding
+        (k, battery_power, generator_power, status) as chunks finish.
+        status is 'optimal', 'cached' (from the optimizer's solution_cache, yielded first),
+        'fallback' (solver failed) or 'timeout'.
+        """
+        solar = np.atleast_2d(np.asarray(solar, dtype=float))
+        load = np.atleast_2d(np.asarray(load, dtype=float))
+        prices = np.broadcast_to(np.asarray(prices, dtype=float), solar.shape)
+        soc = np.broadcast_to(np.asarray(soc, dtype=float), (solar.shape[0],))
+        n_problems, n_periods = solar.shape
+
+        # Problems the optimizer's solution_cache already holds never reach the pool
+        cache = self.optimizer.solution_cache
+        keys, cached = [None] * n_problems, {}
+        if cache is not None:
+            for index in range(n_problems):
+                keys[index] = self.optimizer._cache_key(self.solver, solar[index], load[index], soc[index],
+                                                        prices[index], carbon_cost)
+                plan = self.optimizer._cached_plan(keys[index], soc[index])
+                if plan is not None:
+                    cached[index] = plan
+        pending = [index for index in range(n_problems) if index not in cached]
+
+        if self._executor is None and pending:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        problems_shm = shared_memory.SharedMemory(create=True, size=n_problems * (3 * n_periods + 1) * 8)
+        plans_shm = shared_memory.SharedMemory(create=True, size=n_problems * 2 * n_periods * 8)
+        problems = np.ndarray((n_problems, 3 * n_periods + 1), dtype=np.float64, buffer=problems_shm.buf)
+        plans = np.ndarray((n_problems, 2 * n_periods), dtype=np.float64, buffer=plans_shm.buf)
+        problems[:, :n_periods] = solar
+        problems[:, n_periods:2 * n_periods] = load
+        problems[:, 2 * n_periods:3 * n_periods] = prices
+        problems[:, -1] = soc
+
+        start = time.perf_counter()
+        statuses = {}
+        futures = []
+        try:
+            chunk_size = max(1, math.ceil(len(pending) / (self.max_workers * self.chunks_per_worker)))
+            settings = self._settings()
+            futures = [
+                self._executor.submit(_solve_chunk, problems_shm.name, plans_shm.name,
+                                      (n_problems, n_periods), pending[first:first + chunk_size],
+                                      settings, self.solver, carbon_cost, self.timeout)
+                for first in range(0, len(pending), chunk_size)
+            ]
+
+            for index, (battery_power, generator_power) in cached.items():
+                statuses['cached'] = statuses.get('cached', 0) + 1
+                yield index, battery_power.copy(), generator_power.copy(), 'cached'
+
+            for future in as_completed(futures):
+                for index, status, solve_time in future.result():
+                    statuses[status] = statuses.get(status, 0) + 1
+                    plan = plans[index].copy()
+                    if cache is not None and status == 'optimal':
+                        cache.put(keys[index], plan[:n_periods], plan[n_periods:])
+                    yield index, plan[:n_periods], plan[n_periods:], status
+        finally:
+            # A consumer that stops early must not leave workers reading unlinked memory
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+            elapsed = time.perf_counter() - start
+            solved = sum(statuses.values())
+            self.last_report = {
+                'problems': n_problems,
+                'solved': solved,
+                'statuses': statuses,
+                'seconds': elapsed,
+                'solves_per_second': solved / elapsed if elapsed > 0 else 0.0
+            }
+            del problems, plans
+            for shm in (problems_shm, plans_shm):
+                shm.close()
+                shm.unlink()
+
+    def solve(self, solar, load, soc, prices, carbon_cost=0.02):
+        """Blocking variant of iter_solve returning (battery (K, n), generator (K, n), statuses)"""
+        solar = np.atleast_2d(solar)
+        n_problems, n_periods = solar.shape
+        battery_power = np.empty((n_problems, n_periods))
+        generator_power = np.empty((n_problems, n_periods))
+        statuses = [None] * n_problems
+
+        for index, battery, generator, status in self.iter_solve(solar, load, soc, prices, carbon_cost):
+            battery_power[index] = battery
+            generator_power[index] = generator
+            statuses[index] = status
+        return battery_power, generator_power, statuses
@@ -0,0 +1,20 @@
+import pandas as pd
+
+class WallClock:
+    """Real time; advancing is a no-op"""
+    def now(self):
+        return pd.Timestamp.now()
+
+    def advance(self, seconds):
+        pass
+
+class SimulatedClock:
+    """Manually advanced clock so simulations can run faster (or slower) than real time"""
+    def __init__(self, start=None):
+        self.current = pd.Timestamp.now() if start is None else pd.Timestamp(start)
+
+    def now(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += pd.Timedelta(seconds=seconds)
@@ -1,165 +1,261 @@
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, Patch
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+import os
 from datetime import datetime, timedelta
+import threading
 import time
+from downsampling import EnvelopePyramid
+from history import HistoryBuffer
+from snapshots import Snapshot, SnapshotPublisher
+from telemetry_bus import TelemetrySubscriber
 
 # Create Dash app
 app = dash.Dash(__name__)
 app.title = "MicroGrid Digital Twin Dashboard"
 
-# Global variables to store data
-historical_data = pd.DataFrame()
-current_state = {}
+# Points kept in the live window and in each streamed trace
+MAX_POINTS = 48
 
-def initialize_data():
-    """Initialize sample data"""
-    global historical_data, current_state
-    
-    hours = 24
-    timestamps = [datetime.now() - timedelta(hours=h) for h in range(hours, 0, -1)]
-    
-    historical_data = pd.DataFrame({
-        'timestamp': timestamps,
-        'solar_power': [max(0, 3000 * np.sin(np.pi * (h + 6) / 15)) for h in range(hours)],
-        'load_power': [800 + 2000 * np.exp(-0.5 * ((h - 19) / 3)**2) for h in range(hours)],
-        'grid_power': [500 * np.sin(h/4) for h in range(hours)],
-        'battery_soc': [50 + 20 * np.sin(h/6) for h in range(hours)],
-        'total_cost_inr': [100 + h * 15 for h in range(hours)]
-    })
-    
-    current_state = {
-        'battery_soc': historical_data['battery_soc'].iloc[-1],
-        'solar_power': historical_data['solar_power'].iloc[-1],
-        'load_power': historical_data['load_power'].iloc[-1],
-        'grid_power': historical_data['grid_power'].iloc[-1],
-        'total_cost_inr': historical_data['total_cost_inr'].iloc[-1]
-    }
-
-# Initialize data
-initialize_data()
-
-# Layout
-app.layout = html.Div([
-    html.H1("MicroGrid Digital Twin Dashboard", style={'textAlign': 'center', 'color': '#2c3e50'}),
-    
-    # Control Panel
-    html.Div([
-        html.Button('Start Simulation', id='start-button', n_clicks=0,
-                   style={'backgroundColor': '#27ae60', 'color': 'white', 'margin': '5px'}),
-        html.Button('Reset Simulation', id='reset-button', n_clicks=0,
-                   style={'backgroundColor': '#e74c3c', 'color': 'white', 'margin': '5px'}),
-        html.Button('Inject Cloud Cover', id='cloud-button', n_clicks=0,
-                   style={'backgroundColor': '#3498db', 'color': 'white', 'margin': '5px'}),
-        html.Button('Inject Load Spike', id='load-button', n_clicks=0,
-                   style={'backgroundColor': '#f39c12', 'color': 'white', 'margin': '5px'}),
-        dcc.Interval(id='interval-component', interval=2000, n_intervals=0, disabled=True),
-    ], style={'padding': '10px', 'textAlign': 'center', 'backgroundColor': '#ecf0f1', 'marginBottom': '20px'}),
-    
-    # Key Metrics
-    html.Div([
-        html.Div([
-            dcc.Graph(id='battery-gauge', style={'display': 'inline-block', 'width': '24%'}),
-            dcc.Graph(id='cost-metric', style={'display': 'inline-block', 'width': '24%'}),
-            dcc.Graph(id='solar-metric', style={'display': 'inline-block', 'width': '24%'}),
-            dcc.Graph(id='load-metric', style={'display': 'inline-block', 'width': '24%'}),
-        ]),
-    ], style={'marginBottom': '20px'}),
-    
-    # Main Visualization
-    html.Div([
-        dcc.Graph(id='power-graph', style={'height': '500px'}),
-    ], style={'marginBottom': '20px'}),
-    
-    # Cost Visualization
-    html.Div([
-        dcc.Graph(id='cost-graph', style={'height': '400px'}),
-    ]),
-    
-    # Status Display
-    html.Div([
-        html.H4("System Status:", style={'marginBottom': '10px'}),
-        html.Div(id='status-display')
-    ], style={'marginTop': '20px', 'padding': '10px', 'backgroundColor': '#f8f9fa'})
-])
+# Points per trace when a zoomed view is served from the pyramid. relayoutData carries no
+# plot width, so this is sized for a full-width graph (about one point per pixel).
+VIEWPORT_POINTS = 2000
 
-# Callbacks
-@app.callback(
-    [Output('interval-component', 'disabled'),
-     Output('start-button', 'children'),
-     Output('start-button', 'style')],
-    [Input('start-button', 'n_clicks')]
-)
-def toggle_simulation(n_clicks):
-    if n_clicks % 2 == 1:
-        return False, 'Stop Simulation', {'backgroundColor': '#e74c3c', 'color': 'white', 'margin': '5px'}
-    else:
-        return True, 'Start Simulation', {'backgroundColor': '#27ae60', 'color': 'white', 'margin': '5px'}
+# Raw samples kept for zoomed views (a week of 1-second data); older history comes from
+# the pyramid's coarser levels
+RAW_WINDOW = 7 * 86400
 
-@app.callback(
-    Output('status-display', 'children'),
-    [Input('reset-button', 'n_clicks'),
-     Input('cloud-button', 'n_clicks'),
-     Input('load-button', 'n_clicks')]
-)
-def handle_buttons(reset_clicks, cloud_clicks, load_clicks):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return "System ready. Click 'Start Simulation' to begin."
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    if button_id == 'reset-button' and reset_clicks:
-        initialize_data()
-        return "System reset to initial state."
-    elif button_id == 'cloud-button' and cloud_clicks:
-        # Reduce solar power by 60%
-        current_state['solar_power'] *= 0.4
-        return "Cloud cover injected! Solar power reduced by 60%."
-    elif button_id == 'load-button' and load_clicks:
-        # Increase load by 50%
-        current_state['load_power'] *= 1.5
-        return "Load spike injected! Load increased by 50%."
-    
-    return "System ready. Click 'Start Simulation' to begin."
+POWER_COLUMNS = ['solar_power', 'load_power', 'grid_power', 'battery_soc']
+HISTORY_COLUMNS = POWER_COLUMNS + ['total_cost_inr']
 
-@app.callback(
-    [Output('power-graph', 'figure'),
-     Output('cost-graph', 'figure'),
-     Output('battery-gauge', 'figure'),
-     Output('cost-metric', 'figure'),
-     Output('solar-metric', 'figure'),
-     Output('load-metric', 'figure')],
-    [Input('interval-component', 'n_intervals')]
-)
-def update_dashboard(n_intervals):
-    global historical_data, current_state
-    
-    # Create power flow graph
+SIMULATION_PERIOD = 2.0  # seconds per simulated record
+
+# Dashboard history layout
+DASHBOARD_SCHEMA = {'timestamp': 'datetime64[ns]'}
+DASHBOARD_SCHEMA.update({name: np.float64 for name in HISTORY_COLUMNS})
+
+class DashboardSource:
+    """
+    Where the dashboard's data comes from. A source runs on its own thread, however many
+    browsers are polling, and publishes an immutable Snapshot on every change; callbacks
+    read the latest one and send commands (start/stop, reset, disturbances) through the
+    methods below, which take the same lock as the source's updates.
+    """
+    def __init__(self):
+        self.publisher = SnapshotPublisher()
+        self.history = HistoryBuffer(MAX_POINTS, schema=DASHBOARD_SCHEMA)  # live window
+        self.pyramid = None  # full history, multi-resolution
+        self.state = {name: 0.0 for name in HISTORY_COLUMNS}
+        self.sequence = 0  # records ever added; the live window holds [sequence - len, sequence)
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def latest(self):
+        return self.publisher.latest()
+
+    def _clear(self):
+        self.history.clear()
+        self.pyramid = EnvelopePyramid(HISTORY_COLUMNS, window=RAW_WINDOW)
+
+    def _append(self, record):
+        self.history.append(record)
+        self.pyramid.append([np.datetime64(record['timestamp'], 'ns')],
+                            {name: [record[name]] for name in HISTORY_COLUMNS})
+        self.sequence += 1
+
+    def _publish(self):
+        history = {name: self.history.column(name) for name in DASHBOARD_SCHEMA}
+        self.publisher.publish(Snapshot(self.sequence, self.state, history))
+
+    def query(self, start, end, max_points=VIEWPORT_POINTS):
+        """Downsampled full history over [start, end] (see EnvelopePyramid.query)"""
+        with self._lock:
+            return self.pyramid.query(start, end, max_points=max_points)
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def resume(self):
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def start(self):
+        """Start the source's thread, running the subclass's _run loop"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._running.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+class DashboardSimulator(DashboardSource):
+    """Stand-alone random-walk twin, one record per period; starts paused"""
+    def __init__(self, period=SIMULATION_PERIOD):
+        super().__init__()
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        """Replace the history with sample data"""
+        hours = 24
+        timestamps = [datetime.now() - timedelta(hours=h) for h in range(hours, 0, -1)]
+        with self._lock:
+            self._clear()
+            for h, timestamp in enumerate(timestamps):
+                self._append({
+                    'timestamp': timestamp,
+                    'solar_power': max(0, 3000 * np.sin(np.pi * (h + 6) / 15)),
+                    'load_power': 800 + 2000 * np.exp(-0.5 * ((h - 19) / 3)**2),
+                    'grid_power': 500 * np.sin(h/4),
+                    'battery_soc': 50 + 20 * np.sin(h/6),
+                    'total_cost_inr': 100 + h * 15
+                })
+            self.state = {name: float(self.history.column(name)[-1]) for name in HISTORY_COLUMNS}
+            self._publish()
+
+    def inject_cloud_cover(self):
+        """Reduce solar power by 60%"""
+        with self._lock:
+            self.state['solar_power'] *= 0.4
+            self._publish()
+
+    def inject_load_spike(self):
+        """Increase load by 50%"""
+        with self._lock:
+            self.state['load_power'] *= 1.5
+            self._publish()
+
+    def step(self):
+        """Simulate one new data point"""
+        with self._lock:
+            state = self.state
+            
+            # Add some realistic fluctuations
+            new_solar = max(0, state['solar_power'] * np.random.uniform(0.95, 1.05))
+            new_load = state['load_power'] * np.random.uniform(0.97, 1.03)
+            new_soc = max(20, min(95, state['battery_soc'] + np.random.uniform(-2, 2)))
+            
+            # Calculate grid power based on balance
+            grid_power = new_load - new_solar
+            
+            # Update cost (simple model - 6 INR/kWh)
+            cost_increment = max(0, grid_power) * 6.0 / 1000
+            new_cost = state['total_cost_inr'] + cost_increment
+            
+            self.state = {
+                'battery_soc': new_soc,
+                'solar_power': new_solar,
+                'load_power': new_load,
+                'grid_power': grid_power,
+                'total_cost_inr': new_cost
+            }
+            self._append(dict(self.state, timestamp=datetime.now()))
+            self._publish()
+
+    def _run(self):
+        next_step = time.monotonic()
+        while not self._stopping.is_set():
+            if self._running.wait(timeout=self.period):
+                self.step()
+            # Fixed rate; after a pause or an overrun, restart the schedule from now
+            next_step = max(next_step + self.period, time.monotonic())
+            self._stopping.wait(max(0.0, next_step - time.monotonic()))
+
+class TwinFeed(DashboardSource):
+    """
+    Follows a live AdvancedMicroGridDigitalTwin over its telemetry bus (telemetry_bus.py).
+    The thread sleeps until the twin publishes a cycle, then copies the new frames out of
+    the shared ring. Stop/start pauses following (frames still in the ring are caught up
+    on resume), reset reloads the ring, and the disturbance buttons are sent to the twin's
+    inject_disturbance.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self.subscriber = TelemetrySubscriber(path)
+        self.cursor = 0  # next bus frame to read
+        self.resume()
+        self.reset()
+
+    def _ingest(self):
+        frames = self.subscriber.since(self.cursor)
+        for frame in frames:
+            self._append(frame)
+            self.cursor = frame['sequence'] + 1
+        if frames:
+            self.state = {name: frames[-1][name] for name in HISTORY_COLUMNS}
+        return bool(frames)
+
+    def reset(self):
+        """Rebuild the history from the frames still in the ring"""
+        with self._lock:
+            self._clear()
+            self.cursor = 0
+            self._ingest()
+            self._publish()
+
+    def inject_cloud_cover(self):
+        self.subscriber.send('inject_disturbance', solar_reduction=60)
+
+    def inject_load_spike(self):
+        self.subscriber.send('inject_disturbance', load_increase=50)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.subscriber.wait(timeout=1.0)
+            except ConnectionError:
+                print("Telemetry bus closed; the dashboard keeps the data received so far")
+                return
+            if self.running:
+                with self._lock:
+                    if self._ingest():
+                        self._publish()
+
+# Zoom-out shortcuts, counted back from the newest point; 'Live' autoranges back to the stream
+HISTORY_RANGES = dict(buttons=[
+    dict(count=1, label='1h', step='hour', stepmode='backward'),
+    dict(count=1, label='1d', step='day', stepmode='backward'),
+    dict(count=7, label='1w', step='day', stepmode='backward'),
+    dict(count=1, label='1m', step='month', stepmode='backward'),
+    dict(count=1, label='1y', step='year', stepmode='backward'),
+    dict(label='Live', step='all')
+])
+
+def make_power_figure(data):
+    """Power flow and SOC subplots; traces 0-3 are solar, load, grid and SOC"""
     power_fig = make_subplots(rows=2, cols=1, 
                              subplot_titles=('Power Flow (W)', 'Battery State of Charge (%)'),
                              vertical_spacing=0.15)
     
     power_fig.add_trace(go.Scatter(
-        x=historical_data['timestamp'], y=historical_data['solar_power'],
+        x=data['timestamp'], y=data['solar_power'],
         name='Solar', line=dict(color='orange', width=2), fill='tozeroy'
     ), row=1, col=1)
     
     power_fig.add_trace(go.Scatter(
-        x=historical_data['timestamp'], y=historical_data['load_power'],
+        x=data['timestamp'], y=data['load_power'],
         name='Load', line=dict(color='red', width=2), fill='tozeroy'
     ), row=1, col=1)
     
     power_fig.add_trace(go.Scatter(
-        x=historical_data['timestamp'], y=historical_data['grid_power'],
+        x=data['timestamp'], y=data['grid_power'],
         name='Grid', line=dict(color='blue', width=2)
     ), row=1, col=1)
     
     power_fig.add_trace(go.Scatter(
-        x=historical_data['timestamp'], y=historical_data['battery_soc'],
+        x=data['timestamp'], y=data['battery_soc'],
         name='Battery SOC', line=dict(color='green', width=2)
     ), row=2, col=1)
     
@@ -171,14 +267,17 @@ def update_dashboard(n_intervals):
         paper_bgcolor='white'
     )
     power_fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
+    power_fig.update_xaxes(rangeselector=HISTORY_RANGES, row=1, col=1)
     power_fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
     power_fig.update_yaxes(title_text="Power (W)", row=1, col=1)
     power_fig.update_yaxes(title_text="SOC (%)", row=2, col=1)
-    
-    # Cost Graph
+    return power_fig
+
+def make_cost_figure(data):
+    """Cumulative cost graph"""
     cost_fig = go.Figure()
     cost_fig.add_trace(go.Scatter(
-        x=historical_data['timestamp'], y=historical_data['total_cost_inr'],
+        x=data['timestamp'], y=data['total_cost_inr'],
         name='Total Cost', line=dict(color='purple', width=3)
     ))
     cost_fig.update_layout(
@@ -189,13 +288,16 @@ def update_dashboard(n_intervals):
         plot_bgcolor='white',
         paper_bgcolor='white'
     )
-    cost_fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
+    cost_fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='LightGray', rangeselector=HISTORY_RANGES)
     cost_fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='LightGray')
-    
+    return cost_fig
+
+def make_indicator_figures(state):
+    """Battery gauge and cost/solar/load tiles; later ticks only patch their values"""
     # Battery Gauge
     battery_gauge = go.Figure(go.Indicator(
         mode="gauge+number",
-        value=current_state['battery_soc'],
+        value=state['battery_soc'],
         title={'text': "Battery SOC (%)", 'font': {'size': 16}},
         gauge={
             'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
@@ -220,7 +322,7 @@ def update_dashboard(n_intervals):
     # Cost Metric
     cost_metric = go.Figure(go.Indicator(
         mode="number",
-        value=current_state['total_cost_inr'],
+        value=state['total_cost_inr'],
         title={'text': "Total Cost", 'font': {'size': 16}},
         number={'prefix': "₹", 'valueformat': ".2f", 'font': {'size': 24}},
         domain={'x': [0, 1], 'y': [0, 1]}
@@ -230,7 +332,7 @@ def update_dashboard(n_intervals):
     # Solar Metric
     solar_metric = go.Figure(go.Indicator(
         mode="number",
-        value=current_state['solar_power'],
+        value=state['solar_power'],
         title={'text': "Solar Power", 'font': {'size': 16}},
         number={'suffix': " W", 'font': {'size': 24}},
         domain={'x': [0, 1], 'y': [0, 1]}
@@ -240,69 +342,269 @@ def update_dashboard(n_intervals):
     # Load Metric
     load_metric = go.Figure(go.Indicator(
         mode="number",
-        value=current_state['load_power'],
+        value=state['load_power'],
         title={'text': "Load Power", 'font': {'size': 16}},
         number={'suffix': " W", 'font': {'size': 24}},
         domain={'x': [0, 1], 'y': [0, 1]}
     ))
     load_metric.update_layout(height=250, paper_bgcolor='white')
     
-    return power_fig, cost_fig, battery_gauge, cost_metric, solar_metric, load_metric
+    return battery_gauge, cost_metric, solar_metric, load_metric
 
-@app.callback(
-    Output('interval-component', 'n_intervals'),
-    [Input('interval-component', 'n_intervals')],
-    [State('interval-component', 'disabled')]
-)
-def update_simulation(n_intervals, disabled):
-    global historical_data, current_state
-    
-    if disabled:
-        return n_intervals
-    
-    # Simulate new data point
-    new_timestamp = datetime.now()
-    
-    # Add some realistic fluctuations
-    new_solar = max(0, current_state['solar_power'] * np.random.uniform(0.95, 1.05))
-    new_load = current_state['load_power'] * np.random.uniform(0.97, 1.03)
-    new_soc = max(20, min(95, current_state['battery_soc'] + np.random.uniform(-2, 2)))
-    
-    # Calculate grid power based on balance
-    grid_power = new_load - new_solar
-    
-    # Update cost (simple model - 6 INR/kWh)
-    cost_increment = max(0, grid_power) * 6.0 / 1000
-    new_cost = current_state['total_cost_inr'] + cost_increment
+# One source for every viewer: a live twin's telemetry bus when MICROGRID_BUS names its
+# socket (python src/main.py serves one), otherwise the built-in simulation, paused.
+# Created and started on the first page load or callback, so importing this module
+# starts no thread and opens no subscription.
+source = None
+_source_lock = threading.Lock()
+
+def get_source():
+    global source
+    with _source_lock:
+        if source is None:
+            bus_path = os.environ.get('MICROGRID_BUS')
+            source = TwinFeed(bus_path) if bus_path else DashboardSimulator()
+            source.start()
+        return source
+
+def make_layout(snapshot):
+    """Page layout showing snapshot"""
+    # Static figures are built once per page; ticks stream new points and patch indicator values
+    battery_gauge, cost_metric, solar_metric, load_metric = make_indicator_figures(snapshot.state)
+    return html.Div([
+        html.H1("MicroGrid Digital Twin Dashboard", style={'textAlign': 'center', 'color': '#2c3e50'}),
+    
+        # Control Panel
+        html.Div([
+            html.Button('Start Simulation', id='start-button', n_clicks=0,
+                       style={'backgroundColor': '#27ae60', 'color': 'white', 'margin': '5px'}),
+            html.Button('Reset Simulation', id='reset-button', n_clicks=0,
+                       style={'backgroundColor': '#e74c3c', 'color': 'white', 'margin': '5px'}),
+            html.Button('Inject Cloud Cover', id='cloud-button', n_clicks=0,
+                       style={'backgroundColor': '#3498db', 'color': 'white', 'margin': '5px'}),
+            html.Button('Inject Load Spike', id='load-button', n_clicks=0,
+                       style={'backgroundColor': '#f39c12', 'color': 'white', 'margin': '5px'}),
+            # Polls only while the shared simulation runs (see toggle_simulation)
+            dcc.Interval(id='interval-component', interval=int(SIMULATION_PERIOD * 1000), n_intervals=0,
+                         disabled=True),
+            # Sequence number of the last record this browser has plotted
+            dcc.Store(id='stream-cursor', data=snapshot.sequence),
+            # Zoomed x-range of each graph, or None while it follows the live stream
+            dcc.Store(id='power-view', data=None),
+            dcc.Store(id='cost-view', data=None),
+        ], style={'padding': '10px', 'textAlign': 'center', 'backgroundColor': '#ecf0f1', 'marginBottom': '20px'}),
+    
+        # Key Metrics
+        html.Div([
+            html.Div([
+                dcc.Graph(id='battery-gauge', figure=battery_gauge, style={'display': 'inline-block', 'width': '24%'}),
+                dcc.Graph(id='cost-metric', figure=cost_metric, style={'display': 'inline-block', 'width': '24%'}),
+                dcc.Graph(id='solar-metric', figure=solar_metric, style={'display': 'inline-block', 'width': '24%'}),
+                dcc.Graph(id='load-metric', figure=load_metric, style={'display': 'inline-block', 'width': '24%'}),
+            ]),
+        ], style={'marginBottom': '20px'}),
+    
+        # Main Visualization
+        html.Div([
+            dcc.Graph(id='power-graph', figure=make_power_figure(snapshot.history), style={'height': '500px'}),
+        ], style={'marginBottom': '20px'}),
     
-    # Create new record
-    new_record = {
-        'timestamp': new_timestamp,
-        'solar_power': new_solar,
-        'load_power': new_load,
-        'grid_power': grid_power,
-        'battery_soc': new_soc,
-        'total_cost_inr': new_cost
-    }
+        # Cost Visualization
+        html.Div([
+            dcc.Graph(id='cost-graph', figure=make_cost_figure(snapshot.history), style={'height': '400px'}),
+        ]),
     
-    # Update historical data (keep last 48 records)
-    if len(historical_data) >= 48:
-        historical_data = historical_data.iloc[1:]
+        # Status Display
+        html.Div([
+            html.H4("System Status:", style={'marginBottom': '10px'}),
+            html.Div("System ready. Click 'Start Simulation' to begin.", id='status-display')
+        ], style={'marginTop': '20px', 'padding': '10px', 'backgroundColor': '#f8f9fa'})
+    ])
+
+def serve_layout():
+    """Layout for each page load, from the source's latest snapshot"""
+    return make_layout(get_source().latest())
+
+# Dash calls a layout function once to validate callbacks; an empty snapshot stands in
+# for the source so that assigning the layout does not start it
+app.validation_layout = make_layout(Snapshot(0, {name: 0.0 for name in HISTORY_COLUMNS},
+                                             {name: [] for name in DASHBOARD_SCHEMA}))
+app.layout = serve_layout
+
+# Callbacks
+@app.callback(
+    [Output('interval-component', 'disabled'),
+     Output('start-button', 'children'),
+     Output('start-button', 'style')],
+    [Input('start-button', 'n_clicks')]
+)
+def toggle_simulation(n_clicks):
+    """
+    Start/stop the shared simulation; on page load just show its current state. The
+    interval follows it, so a browser stops polling while the simulation is stopped.
+    """
+    source = get_source()
+    if dash.callback_context.triggered_id == 'start-button':
+        if source.running:
+            source.pause()
+        else:
+            source.resume()
+    if source.running:
+        return False, 'Stop Simulation', {'backgroundColor': '#e74c3c', 'color': 'white', 'margin': '5px'}
+    else:
+        return True, 'Start Simulation', {'backgroundColor': '#27ae60', 'color': 'white', 'margin': '5px'}
+
+@app.callback(
+    [Output('status-display', 'children'),
+     Output('power-graph', 'figure'),
+     Output('cost-graph', 'figure'),
+     Output('stream-cursor', 'data', allow_duplicate=True),
+     Output('power-view', 'data', allow_duplicate=True),
+     Output('cost-view', 'data', allow_duplicate=True)],
+    [Input('reset-button', 'n_clicks'),
+     Input('cloud-button', 'n_clicks'),
+     Input('load-button', 'n_clicks')],
+    prevent_initial_call=True
+)
+def handle_buttons(reset_clicks, cloud_clicks, load_clicks):
+    ctx = dash.callback_context
+    if not ctx.triggered:
+        return ("System ready. Click 'Start Simulation' to begin.",) + (dash.no_update,) * 5
     
-    historical_data = pd.concat([historical_data, pd.DataFrame([new_record])], ignore_index=True)
+    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
     
-    # Update current state
-    current_state.update({
-        'battery_soc': new_soc,
-        'solar_power': new_solar,
-        'load_power': new_load,
-        'grid_power': grid_power,
-        'total_cost_inr': new_cost
-    })
+    if button_id == 'reset-button' and reset_clicks:
+        source = get_source()
+        source.reset()
+        snapshot = source.latest()
+        # History was replaced, so this browser gets full figures instead of a stream
+        return ("System reset to initial state.", make_power_figure(snapshot.history),
+                make_cost_figure(snapshot.history), snapshot.sequence, None, None)
+    elif button_id == 'cloud-button' and cloud_clicks:
+        get_source().inject_cloud_cover()
+        return ("Cloud cover injected! Solar power reduced by 60%.",) + (dash.no_update,) * 5
+    elif button_id == 'load-button' and load_clicks:
+        get_source().inject_load_spike()
+        return ("Load spike injected! Load increased by 50%.",) + (dash.no_update,) * 5
     
-    return n_intervals
+    return ("System ready. Click 'Start Simulation' to begin.",) + (dash.no_update,) * 5
+
+@app.callback(
+    [Output('power-graph', 'extendData'),
+     Output('cost-graph', 'extendData'),
+     Output('battery-gauge', 'figure'),
+     Output('cost-metric', 'figure'),
+     Output('solar-metric', 'figure'),
+     Output('load-metric', 'figure'),
+     Output('stream-cursor', 'data')],
+    [Input('interval-component', 'n_intervals')],
+    [State('stream-cursor', 'data'),
+     State('power-view', 'data'),
+     State('cost-view', 'data')]
+)
+def update_dashboard(n_intervals, cursor, power_view, cost_view):
+    """
+    Stream records this browser has not plotted yet and patch the indicator values,
+    all from the latest snapshot. Zoomed graphs are left alone; they get the live
+    window back when they autorange.
+    """
+    snapshot = get_source().latest()
+    new_points = snapshot.sequence - (cursor or 0)
+    if new_points == 0:
+        return (dash.no_update,) * 7
+    
+    # A cursor ahead of the simulation (the server restarted) gets the whole window
+    if new_points < 0 or new_points > len(snapshot):
+        new_points = len(snapshot)
+    new_data = snapshot.tail(new_points)
+    timestamps = [timestamp.isoformat() for timestamp in pd.to_datetime(new_data['timestamp'])]
+    
+    power_update = ({
+        'x': [timestamps] * 4,
+        'y': [new_data[column].tolist() for column in ('solar_power', 'load_power', 'grid_power', 'battery_soc')]
+    }, [0, 1, 2, 3], MAX_POINTS)
+    cost_update = ({'x': [timestamps], 'y': [new_data['total_cost_inr'].tolist()]}, [0], MAX_POINTS)
+    
+    indicators = []
+    for key in ('battery_soc', 'total_cost_inr', 'solar_power', 'load_power'):
+        patch = Patch()
+        patch['data'][0]['value'] = float(snapshot.state[key])
+        indicators.append(patch)
+    
+    return (dash.no_update if power_view else power_update, dash.no_update if cost_view else cost_update,
+            *indicators, snapshot.sequence)
+
+def zoom_range(relayout, axes):
+    """
+    [start, end] the user zoomed one of the axes to, None when it was autoranged, or
+    no_update for relayouts that do not touch the x-axes (legend clicks, y-zoom, resize)
+    """
+    relayout = relayout or {}
+    for axis in axes:
+        if relayout.get(f'{axis}.autorange'):
+            return None
+        if f'{axis}.range[0]' in relayout:
+            return [relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']]
+        if f'{axis}.range' in relayout:
+            return list(relayout[f'{axis}.range'])
+    return dash.no_update
+
+def view_patch(view, columns, axes):
+    """
+    Figure patch showing view: the pyramid's downsampled history over the zoomed range,
+    or the live window (and autorange) when view is None
+    """
+    patch = Patch()
+    if view is None:
+        live = get_source().latest().history
+        times = [timestamp.isoformat() for timestamp in pd.to_datetime(live['timestamp'])]
+        series = {name: live[name].tolist() for name in columns}
+    else:
+        start, end = (pd.Timestamp(bound).value for bound in view)
+        downsampled = get_source().query(start, end)
+        times = {name: np.datetime_as_string(downsampled[name][0].view('datetime64[ns]'), unit='ms').tolist()
+                 for name in columns}
+        series = {name: downsampled[name][1].tolist() for name in columns}
+
+    for index, name in enumerate(columns):
+        patch['data'][index]['x'] = times if view is None else times[name]
+        patch['data'][index]['y'] = series[name]
+    for axis in axes:
+        if view is None:
+            patch['layout'][axis]['autorange'] = True
+        else:
+            patch['layout'][axis]['range'] = view
+            patch['layout'][axis]['autorange'] = False
+    return patch
+
+@app.callback(
+    [Output('power-graph', 'figure', allow_duplicate=True),
+     Output('power-view', 'data')],
+    [Input('power-graph', 'relayoutData')],
+    prevent_initial_call=True
+)
+def zoom_power_graph(relayout):
+    """Serve the zoomed range from the pyramid; both subplots follow either x-axis"""
+    view = zoom_range(relayout, ('xaxis', 'xaxis2'))
+    if view is dash.no_update:
+        return dash.no_update, dash.no_update
+    return view_patch(view, POWER_COLUMNS, ('xaxis', 'xaxis2')), view
+
+@app.callback(
+    [Output('cost-graph', 'figure', allow_duplicate=True),
+     Output('cost-view', 'data')],
+    [Input('cost-graph', 'relayoutData')],
+    prevent_initial_call=True
+)
+def zoom_cost_graph(relayout):
+    """Serve the zoomed range from the pyramid"""
+    view = zoom_range(relayout, ('xaxis',))
+    if view is dash.no_update:
+        return dash.no_update, dash.no_update
+    return view_patch(view, ['total_cost_inr'], ('xaxis',)), view
 
 if __name__ == '__main__':
     print("Starting MicroGrid Digital Twin Dashboard...")
     print("Open http://127.0.0.1:8050 in your browser")
-    app.run(debug=True, port=8050)
\ No newline at end of file
+    # No reloader: it would import this module in a second process with its own source
+    app.run(debug=True, use_reloader=False, port=8050)
\ No newline at end of file
@@ -0,0 +1,266 @@
+import numpy as np
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: pick n_out of the (x, y) points that best preserve
+    the visual shape of the line. x must be increasing (e.g. int64 nanoseconds).
+    Vectorized variant: each bucket's triangle is anchored on the previous bucket's mean
+    rather than its selected point, so all buckets are scored in one pass.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    x_float = x.astype(np.float64)
+    y_float = y.astype(np.float64)
+
+    # n_out - 2 inner buckets over points 1 .. n - 2; the end points are always kept
+    starts = np.linspace(1, n - 1, n_out - 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.append(starts, n - 1))
+    bucket = np.repeat(np.arange(n_out - 2), sizes)
+    inner_x, inner_y = x_float[1:n - 1], y_float[1:n - 1]
+    mean_x = np.add.reduceat(inner_x, starts - 1) / sizes
+    mean_y = np.add.reduceat(inner_y, starts - 1) / sizes
+
+    anchor_x = np.concatenate([[x_float[0]], mean_x[:-1]])[bucket]
+    anchor_y = np.concatenate([[y_float[0]], mean_y[:-1]])[bucket]
+    next_x = np.concatenate([mean_x[1:], [x_float[-1]]])[bucket]
+    next_y = np.concatenate([mean_y[1:], [y_float[-1]]])[bucket]
+
+    # Twice the triangle area (anchor, candidate, next bucket's mean); first maximum per bucket
+    area = np.abs((anchor_x - next_x) * (inner_y - anchor_y) - (anchor_x - inner_x) * (next_y - anchor_y))
+    best = np.flatnonzero(area == np.maximum.reduceat(area, starts - 1)[bucket])
+    _, first = np.unique(bucket[best], return_index=True)
+
+    selected = np.concatenate([[0], best[first] + 1, [n - 1]])
+    return x[selected], y[selected]
+
+def minmax(x, y, n_out):
+    """
+    Envelope reduction: split the points into n_out // 2 equal-count buckets and keep
+    each bucket's minimum and maximum, in time order. x must be increasing.
+    """
+    n = len(x)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return x, y
+
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(buckets), np.diff(np.append(starts, n)))
+
+    # First minimum and first maximum of every bucket
+    low = np.flatnonzero(y == np.minimum.reduceat(y, starts)[bucket])
+    high = np.flatnonzero(y == np.maximum.reduceat(y, starts)[bucket])
+    _, first_low = np.unique(bucket[low], return_index=True)
+    _, first_high = np.unique(bucket[high], return_index=True)
+
+    selected = np.unique(np.concatenate([low[first_low], high[first_high]]))
+    return x[selected], y[selected]
+
+def _nanoseconds(moment):
+    """int64 ns of a timestamp given as an integer or anything np.datetime64 accepts"""
+    if isinstance(moment, (int, np.integer)):
+        return int(moment)
+    return int(np.datetime64(moment, 'ns').view(np.int64))
+
+class _Level:
+    """Growable column arrays for one pyramid level"""
+    def __init__(self, dtypes):
+        self.dtypes = dtypes
+        self.arrays = {name: np.empty(1024, dtype=dtype) for name, dtype in dtypes.items()}
+        self.size = 0
+
+    def append(self, columns):
+        count = len(next(iter(columns.values())))
+        if self.size + count > len(self.arrays['time']):
+            capacity = max(2 * len(self.arrays['time']), self.size + count)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        for name, values in columns.items():
+            self.arrays[name][self.size:self.size + count] = values
+        self.size += count
+
+    def drop(self, count):
+        """Discard the oldest count entries"""
+        for array in self.arrays.values():
+            array[:self.size - count] = array[count:self.size]
+        self.size -= count
+
+    def __getitem__(self, name):
+        return self.arrays[name][:self.size]
+
+class EnvelopePyramid:
+    """
+    Multi-resolution min/max pyramid over several series sharing one time axis.
+    Level 0 holds raw samples; each level above summarizes `factor` entries of the level
+    below by (start time, end time, min, max, which came first) per series. Appends roll
+    complete blocks up incrementally, so keeping the pyramid current costs O(new points).
+
+    window optionally bounds memory: every level below the top keeps at most 2 * window
+    entries, dropping only the oldest entries already summarized above, so older ranges
+    are served from coarser levels. The top level is never trimmed; it grows by one entry
+    per factor ** max_level samples.
+    """
+    def __init__(self, columns, factor=16, max_level=6, window=None):
+        self.columns = list(columns)
+        self.factor = factor
+        self.window = window
+
+        raw = {'time': np.int64}
+        raw.update({name: np.float32 for name in self.columns})
+        summary = {'time': np.int64, 'end': np.int64}
+        for name in self.columns:
+            summary.update({f"{name}_min": np.float32, f"{name}_max": np.float32,
+                            f"{name}_min_first": np.bool_})
+        self.levels = [_Level(raw)] + [_Level(summary) for _ in range(max_level)]
+        self.rolled = [0] * (max_level + 1)  # entries of level k - 1 summarized into level k
+        self.dropped = [False] * (max_level + 1)  # whether a level lost its oldest entries
+
+    def __len__(self):
+        return self.levels[0].size
+
+    def append(self, timestamps, values):
+        """Append samples: int64 ns timestamps (or datetimes) and a dict of equal-length arrays"""
+        timestamps = np.asarray(timestamps)
+        if timestamps.dtype.kind == 'M':
+            timestamps = timestamps.astype('datetime64[ns]').view(np.int64)
+        columns = {'time': np.asarray(timestamps, dtype=np.int64)}
+        columns.update({name: np.asarray(values[name], dtype=np.float32) for name in self.columns})
+        self.levels[0].append(columns)
+
+        for level in range(1, len(self.levels)):
+            if not self._roll_up(level):
+                break
+
+        # Bound every level below the top, dropping only entries already summarized above
+        if self.window is not None:
+            for level in range(len(self.levels) - 1):
+                entries = self.levels[level]
+                if entries.size > 2 * self.window:
+                    count = min(entries.size - self.window, self.rolled[level + 1])
+                    entries.drop(count)
+                    self.rolled[level + 1] -= count
+                    self.dropped[level] = True
+
+    def _roll_up(self, level):
+        """Summarize complete blocks of level - 1 into level; returns whether any were added"""
+        below = self.levels[level - 1]
+        blocks = (below.size - self.rolled[level]) // self.factor
+        if blocks == 0:
+            return False
+
+        start = self.rolled[level]
+        stop = start + blocks * self.factor
+
+        def block(name):
+            return below[name][start:stop].reshape(blocks, self.factor)
+
+        summary = {'time': block('time')[:, 0],
+                   'end': block('time' if level == 1 else 'end')[:, -1]}
+        for name in self.columns:
+            lows = block(name if level == 1 else f"{name}_min")
+            highs = block(name if level == 1 else f"{name}_max")
+            low_index, high_index = lows.argmin(axis=1), highs.argmax(axis=1)
+            summary[f"{name}_min"] = lows[np.arange(blocks), low_index]
+            summary[f"{name}_max"] = highs[np.arange(blocks), high_index]
+            if level == 1:
+                min_first = low_index <= high_index
+            else:
+                # Same child entry: keep its own order
+                child_first = block(f"{name}_min_first")[np.arange(blocks), low_index]
+                min_first = np.where(low_index == high_index, child_first, low_index < high_index)
+            summary[f"{name}_min_first"] = min_first
+
+        self.levels[level].append(summary)
+        self.rolled[level] = stop
+        return True
+
+    def _points(self, level, lo, hi, name):
+        """Plot points of entries lo:hi of a level: raw samples, or each block's min and max in order"""
+        entries = self.levels[level]
+        if level == 0:
+            return entries['time'][lo:hi], entries[name][lo:hi]
+
+        start, end = entries['time'][lo:hi], entries['end'][lo:hi]
+        low, high = entries[f"{name}_min"][lo:hi], entries[f"{name}_max"][lo:hi]
+        min_first = entries[f"{name}_min_first"][lo:hi]
+        times = np.column_stack([start, end]).ravel()
+        values = np.column_stack([np.where(min_first, low, high), np.where(min_first, high, low)]).ravel()
+        return times, values
+
+    def _range(self, level, start, end):
+        """Entries lo:hi of a level overlapping [start, end], including blocks that straddle either edge"""
+        entries = self.levels[level]
+        ends = entries['time' if level == 0 else 'end']
+        return np.searchsorted(ends, start, 'left'), np.searchsorted(entries['time'], end, 'right')
+
+    def _covers(self, level, start):
+        """Whether a level still holds its entries from start on"""
+        entries = self.levels[level]
+        return entries.size > 0 and not (self.dropped[level] and start < entries['time'][0])
+
+    def _cover(self, level, start, end):
+        """
+        (level, lo, hi) entry ranges covering [start, end] in time order: the blocks of
+        this level lying wholly inside, and the edges (including entries not yet rolled
+        up) from finer levels. An edge whose finer entries were dropped falls back to the
+        straddling blocks of this level.
+        """
+        if start > end:
+            return []
+        entries = self.levels[level]
+        if level > 0:
+            first = np.searchsorted(entries['time'], start, 'left')  # whole blocks: first .. last - 1
+            last = np.searchsorted(entries['end'], end, 'right')
+            if first < last:
+                return (self._edge(level, start, entries['time'][first] - 1) + [(level, first, last)]
+                        + self._edge(level, entries['end'][last - 1] + 1, end))
+            if self._covers(level - 1, start):
+                return self._cover(level - 1, start, end)
+        lo, hi = self._range(level, start, end)
+        return [(level, lo, hi)] if hi > lo else []
+
+    def _edge(self, level, start, end):
+        """Cover a partial block of a level from the level below when it still holds the range"""
+        if self._covers(level - 1, start):
+            return self._cover(level - 1, start, end)
+        lo, hi = self._range(level, start, end)
+        return [(level, lo, hi)] if start <= end and hi > lo else []
+
+    def query(self, start=None, end=None, max_points=2000, method='lttb'):
+        """
+        Downsampled view of [start, end] (int64 ns or anything np.datetime64 accepts):
+        {column: (times int64 ns, values)} with about max_points points per column.
+        The finest level whose entries in range fit 4x the budget is read and reduced
+        with LTTB ('lttb') or to per-bucket min/max pairs ('minmax'). Blocks straddling
+        the window edges are replaced by finer entries, down to raw samples, so the
+        envelope only reflects samples inside the view; only where the finer levels were
+        trimmed (see window) does an edge block's min/max include samples just outside.
+        """
+        start = np.iinfo(np.int64).min if start is None else _nanoseconds(start)
+        end = np.iinfo(np.int64).max if end is None else _nanoseconds(end)
+        budget = 4 * max_points
+
+        chosen = len(self.levels) - 1
+        for level in range(len(self.levels)):
+            if not self._covers(level, start):
+                continue  # empty, or older entries were dropped
+            lo, hi = self._range(level, start, end)
+            if (hi - lo) * (1 if level == 0 else 2) <= budget:
+                chosen = level
+                break
+
+        pieces = self._cover(chosen, start, end)
+        reduce = lttb if method == 'lttb' else minmax
+        result = {}
+        for name in self.columns:
+            parts = [self._points(level, lo, hi, name) for level, lo, hi in pieces]
+            if parts:
+                times = np.clip(np.concatenate([part[0] for part in parts]), start, end)
+                values = np.concatenate([part[1] for part in parts])
+            else:
+                times, values = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            result[name] = reduce(times, values, max_points)
+        return result
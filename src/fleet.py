@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from clock import WallClock
+from history import RELIABILITY_STATES
+from modelica_interface import daily_profiles, PRICE_BY_HOUR
+
+# Reliability codes, indices into RELIABILITY_STATES
+NORMAL, LOW_RESERVE, GENERATOR_ACTIVE, GRID_DEPENDENT, ISLAND_MODE = range(5)
+
+class MicroGridFleet:
+    """
+    Structure-of-arrays state for N microgrids sharing one clock.
+    Simulation, emissions and reliability checks run as single NumPy operations
+    across all sites, mirroring CSVModelicaInterface.simulate_step and the
+    digital twin's calculate_emissions / check_reliability. Like the CSV plant, setpoints
+    are applied as given (only the battery energy is bounded by its capacity); keeping
+    them within power limits is the optimizer's job.
+    """
+    def __init__(self, n_sites, clock=None, battery_soc=50, battery_capacity=10,
+                 battery_min_soc=20, solar_scale=1.0, load_scale=1.0, tariffs=None):
+        self.n_sites = n_sites
+        self.clock = WallClock() if clock is None else clock
+
+        def column(value):
+            return np.broadcast_to(np.asarray(value, dtype=float), (n_sites,)).copy()
+
+        # Per-site parameters
+        self.battery_capacity = column(battery_capacity)  # kWh
+        self.battery_min_soc = column(battery_min_soc)  # %
+        self.solar_scale = column(solar_scale)
+        self.load_scale = column(load_scale)
+        self.grid_available = np.ones(n_sites, dtype=bool)
+
+        # Tariffs (₹/kWh) by hour of day: shared (24,) or per site (n_sites, 24)
+        self.tariffs = PRICE_BY_HOUR if tariffs is None else np.asarray(tariffs, dtype=float)
+
+        self.carbon_intensity_grid = 0.5  # kgCO2/kWh
+        self.carbon_intensity_generator = 0.7  # kgCO2/kWh
+
+        # Per-site state
+        self.battery_soc = column(battery_soc)
+        self.solar_power = np.zeros(n_sites)
+        self.load_power = np.zeros(n_sites)
+        self.grid_power = np.zeros(n_sites)
+        self.battery_setpoint = np.zeros(n_sites)
+        self.generator_setpoint = np.zeros(n_sites)
+        self.total_cost_inr = np.zeros(n_sites)
+        self.carbon_emissions = np.zeros(n_sites)
+        self.reliability_status = np.zeros(n_sites, dtype=np.int8)
+
+    def simulate_step(self, battery_setpoint, generator_setpoint, step_size=300):
+        """Advance every site one step with per-site (or scalar) setpoints in W"""
+        battery_setpoint = np.broadcast_to(np.asarray(battery_setpoint, dtype=float), (self.n_sites,)).copy()
+        generator_setpoint = np.broadcast_to(np.asarray(generator_setpoint, dtype=float), (self.n_sites,)).copy()
+
+        # Update battery SOC
+        battery_energy = self.battery_soc / 100 * self.battery_capacity  # kWh
+        battery_energy = np.clip(battery_energy + battery_setpoint * step_size / 3600 / 1000,
+                                 0, self.battery_capacity)
+        self.battery_soc = battery_energy / self.battery_capacity * 100  # %
+
+        # All sites share the hour of day, so the profiles are computed once
+        hour = np.array([self.clock.now().hour])
+        solar_power, load_power, price = daily_profiles(hour)
+        if self.tariffs.ndim == 2:
+            price = self.tariffs[:, hour[0]]
+        self.solar_power = solar_power[0] * self.solar_scale
+        self.load_power = load_power[0] * self.load_scale
+
+        # Calculate grid power
+        self.grid_power = self.load_power - self.solar_power - battery_setpoint - generator_setpoint
+
+        self.total_cost_inr += (np.maximum(0, self.grid_power) * price +
+                                generator_setpoint * 20.0 / 0.35) * step_size / 3600 / 1000  # Fuel cost 20 ₹/kWh
+        self.battery_setpoint = battery_setpoint
+        self.generator_setpoint = generator_setpoint
+        self.clock.advance(step_size)
+
+    def calculate_emissions(self):
+        """Carbon emissions of the current step for every site"""
+        grid_emissions = np.maximum(0, self.grid_power) * self.carbon_intensity_grid / 1000
+        generator_emissions = self.generator_setpoint * self.carbon_intensity_generator / 1000
+        return grid_emissions + generator_emissions
+
+    def check_reliability(self):
+        """
+        Reliability code per site (index into RELIABILITY_STATES): the twin's checks in the
+        same order, preceded by Island Mode for sites whose grid is unavailable
+        """
+        return np.select(
+            [~self.grid_available,
+             self.grid_power > 5000,
+             self.battery_soc < self.battery_min_soc + 5,
+             self.generator_setpoint > 0],
+            [ISLAND_MODE, GRID_DEPENDENT, LOW_RESERVE, GENERATOR_ACTIVE],
+            default=NORMAL
+        ).astype(np.int8)
+
+    def step(self, battery_setpoint, generator_setpoint, step_size=300):
+        """Simulate, then update emissions and reliability for all sites (state() builds a frame)"""
+        self.simulate_step(battery_setpoint, generator_setpoint, step_size)
+        self.carbon_emissions = self.calculate_emissions()
+        self.reliability_status = self.check_reliability()
+
+    def state(self):
+        """Current fleet state as a DataFrame, one row per site"""
+        return pd.DataFrame({
+            'battery_soc': self.battery_soc,
+            'solar_power': self.solar_power,
+            'load_power': self.load_power,
+            'grid_power': self.grid_power,
+            'battery_setpoint': self.battery_setpoint,
+            'generator_setpoint': self.generator_setpoint,
+            'total_cost_inr': self.total_cost_inr,
+            'carbon_emissions': self.carbon_emissions,
+            'reliability_status': pd.Categorical.from_codes(self.reliability_status, RELIABILITY_STATES)
+        })
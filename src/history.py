@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Column layout of the digital twin history
+TWIN_SCHEMA = {
+    'timestamp': 'datetime64[ns]',
+    'battery_soc': np.float32,
+    'solar_power': np.float32,
+    'load_power': np.float32,
+    'grid_power': np.float32,
+    'battery_setpoint': np.float32,
+    'generator_setpoint': np.float32,
+    'total_cost_inr': np.float64,
+    'carbon_emissions': np.float64,
+    'reliability_status': 'category'
+}
+
+RELIABILITY_STATES = ['Normal', 'Low Reserve', 'Generator Active', 'Grid Dependent', 'Island Mode',
+                      'Plant Fault']
+
+class HistoryBuffer:
+    """
+    Preallocated NumPy-backed columnar ring buffer.
+    Every row is written twice (at slot i and i + capacity), so the most recent
+    rows always form one contiguous slice and can be exposed as a zero-copy DataFrame.
+    Once full, the oldest rows are overwritten, keeping memory bounded.
+    """
+    def __init__(self, capacity=60 * 24 * 31, schema=None, categories=None):
+        self.capacity = capacity
+        self.schema = dict(TWIN_SCHEMA if schema is None else schema)
+        self.categories = {name: list(RELIABILITY_STATES if categories is None else categories.get(name, []))
+                           for name, dtype in self.schema.items() if dtype == 'category'}
+        self._category_codes = {name: {value: code for code, value in enumerate(values)}
+                                for name, values in self.categories.items()}
+
+        # Categorical columns are stored as int8 codes
+        self._columns = {
+            name: np.zeros(2 * capacity, dtype=np.int8 if dtype == 'category' else dtype)
+            for name, dtype in self.schema.items()
+        }
+        self.count = 0  # total rows ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def empty(self):
+        return self.count == 0
+
+    def _encode(self, name, value):
+        """Categorical code for value, registering new categories on first sight"""
+        codes = self._category_codes[name]
+        if value not in codes:
+            codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return codes[value]
+
+    def append(self, record):
+        """Store one row (a dict keyed by column name) in O(1)"""
+        slot = self.count % self.capacity
+        for name, column in self._columns.items():
+            value = record[name]
+            if name in self.categories:
+                value = self._encode(name, value)
+            column[slot] = value
+            column[slot + self.capacity] = value
+        self.count += 1
+
+    def _window(self):
+        """Start/stop of the contiguous slice holding the stored rows, oldest first"""
+        if self.count <= self.capacity:
+            return 0, self.count
+        start = self.count % self.capacity
+        return start, start + self.capacity
+
+    def column(self, name):
+        """Zero-copy view of one column (categorical columns are returned as codes)"""
+        start, stop = self._window()
+        return self._columns[name][start:stop]
+
+    def to_frame(self):
+        """
+        Zero-copy DataFrame over the stored rows.
+        The frame shares memory with the buffer, so copy it if it must outlive later appends.
+        """
+        start, stop = self._window()
+        data = {}
+        for name, column in self._columns.items():
+            values = column[start:stop]
+            if name in self.categories:
+                values = pd.Categorical.from_codes(values, categories=self.categories[name], validate=False)
+            data[name] = values
+        return pd.DataFrame(data, copy=False)
+
+    def clear(self):
+        """Forget all rows without releasing the preallocated storage"""
+        self.count = 0
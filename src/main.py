@@ -1,39 +1,60 @@
 import pandas as pd
 import numpy as np
 import time
+import math
 import os
+from collections import deque
 from datetime import datetime
 
 # Import advanced modules
 from forecaster import AdvancedMicroGridForecaster
-from optimizer import AdvancedMicroGridOptimizer
+from optimizer import AdvancedMicroGridOptimizer, RecedingHorizonController
+from solution_cache import SolutionCache
 from modelica_interface import CSVModelicaInterface
+from modelica_executor import NativeModelicaInterface, ModelAssertionError
+from history import HistoryBuffer
+from telemetry_store import TelemetryStore
+from clock import WallClock
 
 class AdvancedMicroGridDigitalTwin:
-    def __init__(self):
+    def __init__(self, history_dir=None, clock=None, native_plant=False, telemetry_bus=None):
+        # Wall clock by default; pass a SimulatedClock to run in fast time
+        self.clock = WallClock() if clock is None else clock
         self.forecaster = AdvancedMicroGridForecaster()
+        self.forecaster.warm_up()
         self.optimizer = AdvancedMicroGridOptimizer()
+        # Repeated cycles (same forecasts, prices and SOC bucket) reuse their plan
+        self.optimizer.solution_cache = SolutionCache()
+        self.controller = RecedingHorizonController(self.optimizer)
         
         # Initialize simulation
         models_dir = "models"
         model_path = os.path.join(models_dir, "microgrid.mo")
         os.makedirs(models_dir, exist_ok=True)
         
-        self.simulator = CSVModelicaInterface(model_path)
+        # native_plant executes models/microgrid.mo directly instead of the built-in profiles
+        if native_plant:
+            self.simulator = NativeModelicaInterface(model_path, clock=self.clock)
+        else:
+            self.simulator = CSVModelicaInterface(model_path, clock=self.clock)
+        
+        # Initialize data storage (preallocated ring buffer, ~1 month at 1-minute cycles)
+        self.history = HistoryBuffer()
+        
+        # Optional durable history on disk, readable by other processes while we write;
+        # chunks are sealed hourly so a crash loses at most an hour at any cycle rate
+        self.store = TelemetryStore(history_dir, chunk_size=3600, flush_interval=3600) if history_dir else None
         
-        # Initialize data storage
-        self.historical_data = pd.DataFrame(columns=[
-            'timestamp', 'battery_soc', 'solar_power', 'load_power', 
-            'grid_power', 'battery_setpoint', 'generator_setpoint', 
-            'total_cost', 'carbon_emissions', 'reliability_status'
-        ])
+        # Optional TelemetryBus: every cycle is published to local dashboards/consumers,
+        # and their commands (e.g. disturbances) are applied before the next cycle
+        self.bus = telemetry_bus
         
         self.current_state = {
             'battery_soc': 50,
             'solar_power': 0,
             'load_power': 800,
             'grid_power': 0,
-            'total_cost': 0,
+            'total_cost_inr': 0,
             'carbon_emissions': 0,
             'reliability_status': 'Normal'
         }
@@ -42,8 +63,21 @@ class AdvancedMicroGridDigitalTwin:
             'carbon_cost': 0.02,
             'battery_min_soc': 20,
             'battery_max_soc': 95,
-            'grid_available': True
+            'grid_available': True,
+            'online_learning': False,  # fold measured solar/load into the forecasters each cycle
+            'scenarios': 0,  # > 0: stochastic dispatch over this many sampled forecast scenarios
+            'latency_budgets': {'forecast': 2.0, 'optimize': 5.0, 'simulate': 1.0},  # seconds per stage
+            'time_grid': None  # TimeGrid to plan on; None plans on the hourly forecast steps
         }
+        
+        # Per-stage latencies of the last cycle and a bounded log of budget overruns (and plant faults)
+        self.cycle_timings = {}
+        self.deadline_misses = deque(maxlen=1000)
+    
+    @property
+    def historical_data(self):
+        """Zero-copy DataFrame view of the recorded history"""
+        return self.history.to_frame()
     
     def update_config(self, **kwargs):
         """Update configuration parameters"""
@@ -52,25 +86,69 @@ class AdvancedMicroGridDigitalTwin:
         self.optimizer.battery_min_soc = self.config['battery_min_soc']
         self.optimizer.battery_max_soc = self.config['battery_max_soc']
     
-    def run_optimization_cycle(self):
-        """Run one complete optimization cycle with advanced features"""
-        # Get forecasts
-        solar_forecast, load_forecast = self.forecaster.forecast()
+    def get_forecasts(self, start=None):
+        """
+        Forecast inputs for one cycle: (solar, load, scenarios). scenarios is a
+        (solar_scenarios, load_scenarios) pair for stochastic dispatch, otherwise None.
+        """
+        if start is None:
+            start = self.clock.now()
         
-        # Generate price forecast (time-of-use pricing)
-        hours = list(range(24))
-        price_forecast = [0.12 if h < 8 or h >= 22 else 
-                          0.15 if h < 18 else 
-                          0.20 for h in hours]
+        # Sampled scenarios for stochastic dispatch, point forecasts otherwise
+        if self.config['scenarios']:
+            solar_scenarios, load_scenarios = self.forecaster.sample_scenarios(
+                self.forecaster.forecast_index(start=start), self.config['scenarios']
+            )
+            return solar_scenarios.mean(axis=0), load_scenarios.mean(axis=0), (solar_scenarios, load_scenarios)
         
-        # Run advanced optimization
-        try:
-            battery_schedule, generator_schedule = self.optimizer.multi_objective_optimization(
-                solar_forecast, load_forecast, 
-                self.current_state['battery_soc'], 
-                price_forecast,
-                carbon_cost=self.config['carbon_cost']
+        solar_forecast, load_forecast = self.forecaster.forecast(start=start)
+        return solar_forecast, load_forecast, None
+    
+    def price_forecast(self, start=None, hours=24):
+        """Time-of-use prices for the hourly forecast steps from start (default now)"""
+        if start is None:
+            start = self.clock.now()
+        return [0.12 if h < 8 or h >= 22 else 
+                0.15 if h < 18 else 
+                0.20 for h in self.forecaster.forecast_index(hours, start=start).hour]
+    
+    def compute_setpoints(self, solar_forecast, load_forecast, price_forecast, scenarios=None, time_limit=None):
+        """
+        Run advanced optimization, warm-started from the previous cycle's plan, and return
+        the immediate (battery_setpoint, generator_setpoint) in W. The solve falls back to the
+        best feasible plan at hand when time_limit (seconds) runs out. Hourly forecasts and
+        prices are resampled onto config['time_grid'] when one is set.
+        """
+        grid = self.config['time_grid']
+        if grid is not None:
+            solar_forecast, load_forecast, price_forecast = (
+                grid.resample(values) for values in (solar_forecast, load_forecast, price_forecast)
             )
+            if scenarios is not None:
+                scenarios = (grid.resample(scenarios[0]), grid.resample(scenarios[1]))
+            step_hours = grid.steps
+        else:
+            step_hours = 1.0
+        
+        try:
+            if scenarios is not None:
+                battery_schedule, generator_schedule = self.optimizer.stochastic_optimization(
+                    scenarios[0], scenarios[1],
+                    self.current_state['battery_soc'],
+                    price_forecast,
+                    carbon_cost=self.config['carbon_cost'],
+                    time_limit=time_limit,
+                    step_hours=step_hours
+                )
+            else:
+                battery_schedule, generator_schedule = self.controller.step(
+                    solar_forecast, load_forecast, 
+                    self.current_state['battery_soc'], 
+                    price_forecast,
+                    carbon_cost=self.config['carbon_cost'],
+                    time_limit=time_limit,
+                    step_hours=step_hours
+                )
             
             # Extract immediate setpoints
             battery_setpoint = battery_schedule[0] * 1000  # Convert kW to W
@@ -82,7 +160,8 @@ class AdvancedMicroGridDigitalTwin:
             forecast_data = {
                 'solar': solar_forecast,
                 'load': load_forecast,
-                'prices': price_forecast
+                'prices': price_forecast,
+                'step_hours': step_hours
             }
             battery_setpoint, generator_setpoint = self.optimizer.real_time_control(
                 self.current_state, forecast_data
@@ -90,46 +169,192 @@ class AdvancedMicroGridDigitalTwin:
             battery_setpoint *= 1000
             generator_setpoint *= 1000
         
+        return battery_setpoint, generator_setpoint
+    
+    def carbon_tradeoff(self, carbon_costs, **kwargs):
+        """
+        Pareto front of (cost, emissions) over a grid of carbon weights for the current
+        forecast and state; keyword arguments go to AdvancedMicroGridOptimizer.pareto_sweep
+        """
+        solar_forecast, load_forecast, _ = self.get_forecasts()
+        price_forecast = self.price_forecast()
+        grid = self.config['time_grid']
+        if grid is not None:
+            solar_forecast, load_forecast, price_forecast = (
+                grid.resample(values) for values in (solar_forecast, load_forecast, price_forecast)
+            )
+        return self.optimizer.pareto_sweep(
+            solar_forecast, load_forecast, self.current_state['battery_soc'], price_forecast, carbon_costs,
+            step_hours=1.0 if grid is None else grid.steps, **kwargs
+        )
+    
+    def apply_setpoints(self, battery_setpoint, generator_setpoint):
+        """Simulate one step with the given setpoints; returns (new_state, history record)"""
         # Apply grid outage if configured
         if not self.config['grid_available']:
             # Force island mode - no grid connection
             pass
         
         # Apply setpoints to simulator
-        new_state = self.simulator.simulate_step(battery_setpoint, generator_setpoint)
+        plant_fault = None
+        try:
+            new_state = self.simulator.simulate_step(battery_setpoint, generator_setpoint)
+        except ModelAssertionError as e:
+            # The native plant model rejected the step (e.g. a battery limit): log it and
+            # run the step unchecked so the twin keeps cycling, flagged as a plant fault
+            print(f"Plant model assertion failed: {e}")
+            plant_fault = str(e)
+            self.deadline_misses.append({'timestamp': self.clock.now(), 'stage': 'simulate', 'error': plant_fault})
+            new_state = self.simulator.simulate_step(battery_setpoint, generator_setpoint, check_asserts=False)
+        
+        # Keep the applied setpoints in the state for the emissions/reliability checks
+        new_state.update({
+            'battery_setpoint': battery_setpoint,
+            'generator_setpoint': generator_setpoint
+        })
         
         # Calculate carbon emissions
         carbon_emissions = self.calculate_emissions(new_state)
         
         # Check system reliability
-        reliability_status = self.check_reliability(new_state)
+        reliability_status = 'Plant Fault' if plant_fault else self.check_reliability(new_state)
         
         # Update state with additional metrics
         new_state.update({
             'carbon_emissions': carbon_emissions,
             'reliability_status': reliability_status
         })
+        self.current_state = new_state
         
-        # Store results
         new_record = {
-            'timestamp': pd.Timestamp.now(),
+            'timestamp': self.clock.now(),
             'battery_soc': new_state['battery_soc'],
             'solar_power': new_state['solar_power'],
             'load_power': new_state['load_power'],
             'grid_power': new_state['grid_power'],
             'battery_setpoint': battery_setpoint,
             'generator_setpoint': generator_setpoint,
-            'total_cost': new_state['total_cost'],
+            'total_cost_inr': new_state['total_cost_inr'],
             'carbon_emissions': carbon_emissions,
             'reliability_status': reliability_status
         }
+        return new_state, new_record
+    
+    def observe(self, observations):
+        """Track reality with measured solar/load (DataFrame indexed by timestamp)"""
+        if self.config['online_learning']:
+            self.forecaster.update(observations)
+    
+    def persist(self, record):
+        """Store one history record in memory and, if configured, on disk"""
+        self.history.append(record)
+        if self.store is not None:
+            try:
+                self.store.append(record)
+            except ValueError as e:
+                # e.g. a restarted simulated clock replaying stored times: keep it in memory only
+                print(f"Record not stored on disk: {e}")
+    
+    def publish(self, record, solar_forecast=None, load_forecast=None, price_forecast=None):
+        """Publish one cycle's record and forecasts on the telemetry bus, if there is one"""
+        if self.bus is not None:
+            self.bus.publish(record, solar_forecast, load_forecast, price_forecast)
+    
+    def apply_commands(self):
+        """Apply commands sent by telemetry bus subscribers since the last cycle"""
+        if self.bus is None:
+            return
+        for command in self.bus.commands():
+            args = command.get('args') or {}
+            if command.get('command') == 'inject_disturbance':
+                self.inject_disturbance(
+                    solar_reduction=float(args.get('solar_reduction', 0)),
+                    load_increase=float(args.get('load_increase', 0)),
+                    grid_outage=bool(args.get('grid_outage', False))
+                )
+            else:
+                print(f"Ignoring unknown telemetry command: {command.get('command')!r}")
+    
+    def run_optimization_cycle(self):
+        """Run one complete optimization cycle with advanced features"""
+        budgets = self.config['latency_budgets']
+        self.apply_commands()
+        cycle_start = time.perf_counter()
         
-        new_df = pd.DataFrame([new_record])
-        self.historical_data = pd.concat([self.historical_data, new_df], ignore_index=True)
-        self.current_state = new_state
+        # Get forecasts
+        solar_forecast, load_forecast, scenarios = self.get_forecasts()
+        forecast_time = time.perf_counter() - cycle_start
+        
+        # The solve gets its own budget, less any forecast overrun
+        time_limit = max(0.0, budgets['optimize'] - max(0.0, forecast_time - budgets['forecast']))
+        optimize_start = time.perf_counter()
+        price_forecast = self.price_forecast()
+        battery_setpoint, generator_setpoint = self.compute_setpoints(
+            solar_forecast, load_forecast, price_forecast, scenarios, time_limit
+        )
+        optimize_time = time.perf_counter() - optimize_start
+        
+        simulate_start = time.perf_counter()
+        new_state, new_record = self.apply_setpoints(battery_setpoint, generator_setpoint)
+        simulate_time = time.perf_counter() - simulate_start
+        
+        timestamp = new_record['timestamp']
+        self._record_timings(timestamp, {
+            'forecast': forecast_time,
+            'optimize': optimize_time,
+            'simulate': simulate_time
+        })
+        
+        # Track reality with the freshly measured solar and load
+        self.observe(pd.DataFrame({
+            'solar': [new_state['solar_power']],
+            'load': [new_state['load_power']]
+        }, index=[timestamp]))
+        
+        # Store results
+        self.persist(new_record)
+        self.publish(new_record, solar_forecast, load_forecast, price_forecast)
         
         return new_state, battery_setpoint, generator_setpoint
     
+    def _record_timings(self, timestamp, timings):
+        """Keep the last cycle's stage latencies and log stages that exceeded their budget"""
+        self.cycle_timings = timings
+        budgets = self.config['latency_budgets']
+        for stage, latency in timings.items():
+            if latency > budgets[stage]:
+                self.deadline_misses.append({
+                    'timestamp': timestamp,
+                    'stage': stage,
+                    'latency': latency,
+                    'budget': budgets[stage]
+                })
+    
+    def run_control_loop(self, period=60, cycles=None):
+        """
+        Run optimization cycles on a fixed tick of `period` seconds.
+        A cycle that overruns its tick is logged as a 'cycle' deadline miss and the loop
+        resumes on the next tick boundary instead of bursting to catch up.
+        """
+        next_tick = time.monotonic()
+        completed = 0
+        while cycles is None or completed < cycles:
+            tick_start = time.monotonic()
+            self.run_optimization_cycle()
+            completed += 1
+            
+            next_tick += period
+            now = time.monotonic()
+            if now > next_tick and period > 0:
+                self.deadline_misses.append({
+                    'timestamp': self.clock.now(),
+                    'stage': 'cycle',
+                    'latency': now - tick_start,
+                    'budget': period
+                })
+                next_tick += period * math.ceil((now - next_tick) / period)
+            time.sleep(max(0.0, next_tick - now))
+    
     def calculate_emissions(self, state):
         """Calculate carbon emissions for the current state"""
         grid_emissions = max(0, state['grid_power']) * self.optimizer.carbon_intensity_grid / 1000
@@ -159,6 +384,11 @@ class AdvancedMicroGridDigitalTwin:
         if grid_outage:
             self.current_state['reliability_status'] = 'Island Mode'
     
+    def close(self):
+        """Seal any buffered history rows to disk"""
+        if self.store is not None:
+            self.store.flush()
+    
     def get_system_health(self):
         """Get overall system health assessment"""
         recent_data = self.historical_data.tail(10)
@@ -166,11 +396,22 @@ class AdvancedMicroGridDigitalTwin:
         if recent_data.empty:
             return "No data available"
         
-        avg_cost = recent_data['total_cost'].mean()
+        avg_cost = recent_data['total_cost_inr'].mean()
         avg_emissions = recent_data['carbon_emissions'].mean()
         reliability = recent_data['reliability_status'].value_counts().idxmax()
         
         if avg_cost > 1.0 or avg_emissions > 2.0 or reliability != 'Normal':
             return "Needs Attention"
         else:
-            return "Healthy"
\ No newline at end of file
+            return "Healthy"
+
+if __name__ == '__main__':
+    # Serve the twin to local dashboards: MICROGRID_BUS=/tmp/microgrid.sock python src/dashboard.py
+    from telemetry_bus import TelemetryBus
+    
+    with TelemetryBus(os.environ.get('MICROGRID_BUS', '/tmp/microgrid.sock')) as bus:
+        digital_twin = AdvancedMicroGridDigitalTwin(telemetry_bus=bus)
+        try:
+            digital_twin.run_control_loop(period=float(os.environ.get('MICROGRID_PERIOD', 60)))
+        finally:
+            digital_twin.close()
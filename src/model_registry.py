@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+import joblib
+
+class ModelRegistry:
+    """
+    Process-wide cache of joblib artifacts.
+    Each file is deserialized once and reloaded only when it changes on disk,
+    detected either by modification time/size ('mtime') or content hash ('hash').
+    In 'hash' mode the file is only hashed when its modification time or size changed,
+    so a touched but identical file stays cached without rereading it on every get().
+    """
+    def __init__(self, validation='mtime'):
+        if validation not in ('mtime', 'hash'):
+            raise ValueError(f"Unknown validation mode: {validation}")
+        self.validation = validation
+        self._entries = {}  # path -> (stat, signature, artifact)
+        self._versions = {}  # path -> in-memory modifications of the shared artifact
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+
+    def _stat(self, path):
+        """Cheap change marker for a file; raises FileNotFoundError if it is missing"""
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _digest(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, path, mmap_mode=None):
+        """Return the artifact at path, loading it only if it is new or has changed"""
+        path = os.path.abspath(path)
+        with self._lock:
+            stat = self._stat(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stat:
+                self.hits += 1
+                return entry[2]
+
+            signature = stat
+            if self.validation == 'hash':
+                signature = self._digest(path)
+                if entry is not None and entry[1] == signature:
+                    self._entries[path] = (stat, signature, entry[2])
+                    self.hits += 1
+                    return entry[2]
+
+            artifact = joblib.load(path, mmap_mode=mmap_mode)
+            self._entries[path] = (stat, signature, artifact)
+            self.loads += 1
+            return artifact
+
+    def put(self, path, artifact):
+        """Save an artifact and register the in-memory object as its current version"""
+        path = os.path.abspath(path)
+        with self._lock:
+            joblib.dump(artifact, path)
+            stat = self._stat(path)
+            self._entries[path] = (stat, self._digest(path) if self.validation == 'hash' else stat, artifact)
+
+    def warm_up(self, paths, mmap_mode=None):
+        """Load every artifact up front so the first request pays no disk I/O"""
+        return [self.get(path, mmap_mode=mmap_mode) for path in paths]
+
+    def invalidate(self, path=None):
+        """Drop one cached artifact, or all of them when path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def modified(self, path):
+        """
+        Record that the cached artifact at path was changed in place (e.g. by online
+        learning), so everything derived from it in this process sees a new signature
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def signature(self, path):
+        """Current change marker of a cached artifact (file and in-memory version), or None if it is not loaded"""
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        return None if entry is None else (entry[1], self._versions.get(path, 0))
+
+# Shared by every forecaster in the process
+registry = ModelRegistry()
@@ -0,0 +1,365 @@
+import ast
+import contextlib
+import re
+import numpy as np
+import pandas as pd
+
+from clock import WallClock
+
+# Names available to compiled model expressions: no builtins, only the where() helper
+_EVAL_GLOBALS = {'_where': np.where, '__builtins__': {}}
+
+# Python syntax a translated expression may use: arithmetic, comparisons, names, numbers
+# and _where() calls. Anything else (attributes, subscripts, lambdas, ...) is rejected
+# before eval(), so a model file cannot run arbitrary code.
+_EXPRESSION_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name,
+                     ast.Load, ast.Constant, ast.operator, ast.unaryop, ast.cmpop)
+
+INR_PER_USD = 83.0  # models/microgrid.mo states its costs in $
+
+class ModelAssertionError(RuntimeError):
+    """A Modelica assert() condition was violated during simulation"""
+
+class ModelicaSyntaxError(ValueError):
+    """Modelica source outside the supported subset, or malformed"""
+
+def compile_expression(expr, filename='<model>'):
+    """Translate a Modelica expression and compile it for eval() with _EVAL_GLOBALS"""
+    source = translate_expression(expr)
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError:
+        raise ModelicaSyntaxError(f"Malformed expression: {expr}") from None
+    for node in ast.walk(tree):
+        allowed = isinstance(node, _EXPRESSION_NODES)
+        if isinstance(node, ast.Call):
+            allowed = isinstance(node.func, ast.Name) and node.func.id == '_where' and not node.keywords
+        elif isinstance(node, ast.Name):
+            allowed = not node.id.startswith('__')
+        if not allowed:
+            raise ModelicaSyntaxError(f"Unsupported expression: {expr}")
+    return compile(tree, filename, 'eval')
+
+def _split_top_level(text, separator=';'):
+    """Split on separator outside brackets, parentheses and string literals"""
+    parts, depth, in_string, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            in_string = not in_string
+        elif not in_string:
+            if char in '([':
+                depth += 1
+            elif char in ')]':
+                depth -= 1
+            elif char == separator and depth == 0:
+                parts.append(''.join(current).strip())
+                current = []
+                continue
+        current.append(char)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+def _find_keyword(text, keyword, start=0):
+    """Position of keyword at parenthesis depth 0 of text[start:], or -1"""
+    depth = 0
+    for match in re.finditer(r'[()]|\b' + keyword + r'\b', text[start:]):
+        token = match.group()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth < 0:
+                return -1
+        elif depth == 0:
+            return start + match.start()
+    return -1
+
+def _group_end(text, start):
+    """End of the parenthesised group (or whole expression) containing position start"""
+    depth = 0
+    for position in range(start, len(text)):
+        if text[position] == '(':
+            depth += 1
+        elif text[position] == ')':
+            if depth == 0:
+                return position
+            depth -= 1
+    return len(text)
+
+def translate_expression(expr):
+    """Translate a Modelica expression (subset) into a NumPy-evaluable Python expression"""
+    expr = ' '.join(expr.split())
+    expr = re.sub(r'\b(\w+)\.y\[1\]', r'\1__y', expr)  # CombiTimeTable output
+    expr = expr.replace('^', '**')
+
+    # if c then a else b  ->  _where(c, a, b); the else branch runs to the end of its group
+    while True:
+        match = re.search(r'\bif\b', expr)
+        if match is None:
+            break
+        start = match.start()
+        end = _group_end(expr, start)
+        then_pos = _find_keyword(expr[:end], 'then', start + 2)
+        else_pos = _find_keyword(expr[:end], 'else', then_pos + 4)
+        if then_pos < 0 or else_pos < 0:
+            raise ModelicaSyntaxError(f"Malformed if-expression: {expr}")
+        condition = expr[start + 2:then_pos].strip()
+        true_branch = expr[then_pos + 4:else_pos].strip()
+        false_branch = expr[else_pos + 4:end].strip()
+        expr = (expr[:start] + f"_where({condition}, {true_branch}, {false_branch})" + expr[end:])
+
+    # Boolean operators (top level) -> element-wise NumPy operators
+    for keyword, operator in (('or', '|'), ('and', '&')):
+        position = _find_keyword(expr, keyword)
+        if position >= 0:
+            left, right = expr[:position], expr[position + len(keyword):]
+            return f"({translate_expression(left)}) {operator} ({translate_expression(right)})"
+    return re.sub(r'\bnot\b', '~', expr).strip()
+
+class NativeModelicaModel:
+    """
+    Lightweight executor for the Modelica subset used by models/microgrid.mo:
+    Real inputs/outputs/parameters/states, CombiTimeTable sources and simple equations
+    (explicit assignments, der(x) = ..., assert). Equations are compiled once into
+    NumPy expressions and evaluated over whole input trajectories at once.
+    der() right-hand sides are integrated per hour, matching the Wh/W units of the model.
+    Expressions are restricted to arithmetic, comparisons and if-expressions over model
+    names (see compile_expression) and evaluated without builtins; anything else raises
+    ModelicaSyntaxError.
+    """
+    def __init__(self, model_path, derivative_time_scale=3600):
+        self.model_path = model_path
+        self.derivative_time_scale = derivative_time_scale
+        self.inputs = []
+        self.outputs = []
+        self.parameters = {}
+        self.states = {}  # name -> start value
+        self.tables = {}  # name -> (times in seconds, values, period)
+        self.assignments = []  # (name, compiled expression, dependencies), in evaluation order
+        self.derivatives = {}  # state -> (compiled expression, dependencies)
+        self.assertions = []  # (compiled condition, message)
+
+        with open(model_path) as f:
+            self.parse(f.read())
+
+    def parse(self, source):
+        """
+        Parse model source. Anything outside the supported subset raises ModelicaSyntaxError
+        naming the file and line of the offending statement.
+        """
+        source = re.sub(r'//[^\n]*', '', source)
+        self._source = source  # comments removed, lines kept, for error locations
+        source = re.sub(r'^\s*model\s+\w+', '', source)
+        source = re.sub(r'\bend\s+\w+\s*;\s*$', '', source.strip())
+        declarations, _, equations = re.split(r'^\s*(equation)\s*$', source, maxsplit=1, flags=re.M)
+
+        for statement in _split_top_level(declarations):
+            with self._located(statement):
+                self._parse_declaration(statement)
+        self._parse_equations(_split_top_level(equations))
+
+    @contextlib.contextmanager
+    def _located(self, statement):
+        """Prefix errors raised while handling statement with its file and line"""
+        try:
+            yield
+        except ValueError as e:  # ModelicaSyntaxError, or a malformed number
+            position = self._source.find(statement)
+            line = self._source.count('\n', 0, position) + 1 if position >= 0 else '?'
+            raise ModelicaSyntaxError(f"{self.model_path}, line {line}: {e}") from None
+
+    def _constant(self, expr):
+        """Value of a parameter or start expression over the parameters parsed so far"""
+        return float(eval(compile_expression(expr, self.model_path), _EVAL_GLOBALS, dict(self.parameters)))
+
+    def _parse_declaration(self, statement):
+        statement = re.sub(r'"[^"]*"\s*$', '', statement).strip()  # trailing description
+
+        match = re.match(r'(input|output)\s+Real\s+(\w+)$', statement)
+        if match:
+            (self.inputs if match.group(1) == 'input' else self.outputs).append(match.group(2))
+            return
+
+        match = re.match(r'parameter\s+Real\s+(\w+)\s*=\s*(.+)$', statement, re.S)
+        if match:
+            self.parameters[match.group(1)] = self._constant(match.group(2))
+            return
+
+        match = re.match(r'Real\s+(\w+)\s*\(\s*start\s*=\s*(.+)\)$', statement, re.S)
+        if match:
+            self.states[match.group(1)] = self._constant(match.group(2))
+            return
+
+        match = re.match(r'Modelica\.Blocks\.Sources\.CombiTimeTable\s+(\w+)\s*\((.*)\)$', statement, re.S)
+        if match:
+            self._parse_table(match.group(1), match.group(2))
+            return
+
+        raise ModelicaSyntaxError(f"Unsupported declaration: {statement}")
+
+    def _parse_table(self, name, arguments):
+        options = {}
+        for argument in _split_top_level(arguments, ','):
+            key, _, value = argument.partition('=')
+            options[key.strip()] = value.strip()
+
+        if 'table' not in options:
+            raise ModelicaSyntaxError(f"CombiTimeTable {name} has no table")
+        rows = [row.split(',') for row in options['table'].strip('[]').split(';')]
+        table = np.array([[float(value) for value in row] for row in rows])
+        time_scale = float(options.get('timeScale', 1))
+
+        # Tables describe one repeating profile, so lookups wrap around its span
+        times = table[:, 0] * time_scale
+        self.tables[name] = (times, table[:, 1], times[-1] - times[0])
+
+    def _parse_equations(self, statements):
+        pending = {}  # name -> (compiled expression, dependencies)
+        for statement in statements:
+            with self._located(statement):
+                match = re.match(r'assert\s*\((.*),\s*"([^"]*)"\s*\)$', statement, re.S)
+                if match:
+                    self.assertions.append((self._compile(match.group(1)), match.group(2)))
+                    continue
+
+                left, _, right = statement.partition('=')
+                left = left.strip()
+                match = re.match(r'der\s*\(\s*(\w+)\s*\)$', left)
+                if match:
+                    self.derivatives[match.group(1)] = (self._compile(right), self._dependencies(right))
+                elif re.match(r'\w+$', left):
+                    pending[left] = (self._compile(right), self._dependencies(right))
+                else:
+                    raise ModelicaSyntaxError(f"Unsupported equation: {statement}")
+
+        # Order explicit assignments so every variable is computed before it is used
+        while pending:
+            ready = [name for name, (_, dependencies) in pending.items() if not dependencies & set(pending)]
+            if not ready:
+                raise ModelicaSyntaxError(f"{self.model_path}: algebraic loop between {sorted(pending)}")
+            for name in ready:
+                code, dependencies = pending.pop(name)
+                self.assignments.append((name, code, dependencies))
+
+    def _dependencies(self, expr):
+        return set(re.findall(r'\b[A-Za-z_]\w*\b', translate_expression(expr)))
+
+    def _compile(self, expr):
+        return compile_expression(expr, self.model_path)
+
+    def _evaluate(self, namespace, skip=()):
+        """Evaluate the assignments in order (except those in skip), adding results to namespace"""
+        for name, code, _ in self.assignments:
+            if name not in skip:
+                namespace[name] = eval(code, _EVAL_GLOBALS, namespace)
+
+    def _state_dependent(self):
+        """Names whose value depends, directly or via assignments, on a state"""
+        depends = set(self.states)
+        for name, _, dependencies in self.assignments:
+            if dependencies & depends:
+                depends.add(name)
+        return depends
+
+    def simulate(self, inputs, start_time=0.0, step_size=300, initial_state=None, check_asserts=True):
+        """
+        Simulate N steps with inputs held constant over each step.
+        inputs: dict of input name -> array of length N. start_time is in model seconds.
+        Returns (trajectories, final_state); trajectories hold every state and variable at
+        the end of each step.
+        """
+        inputs = {name: np.asarray(values, dtype=float) for name, values in inputs.items()}
+        n_steps = len(next(iter(inputs.values())))
+        state = dict(self.states if initial_state is None else initial_state)
+        times = start_time + step_size * np.arange(1, n_steps + 1)
+
+        namespace = dict(self.parameters)
+        namespace.update(inputs)
+        for name, (table_times, values, period) in self.tables.items():
+            namespace[f"{name}__y"] = np.interp(times, table_times, values, period=period)
+
+        dt = step_size / self.derivative_time_scale
+        state_dependent = self._state_dependent()
+        if any(dependencies & state_dependent for _, dependencies in self.derivatives.values()):
+            # Explicit Euler, one step at a time
+            trajectories = {name: np.empty(n_steps) for name in self.states}
+            for k in range(n_steps):
+                step_namespace = {name: value[k] if isinstance(value, np.ndarray) else value
+                                  for name, value in namespace.items()}
+                step_namespace.update(state)
+                self._evaluate(step_namespace)
+                for name, (code, _) in self.derivatives.items():
+                    state[name] = state[name] + dt * eval(code, _EVAL_GLOBALS, step_namespace)
+                    trajectories[name][k] = state[name]
+        else:
+            # Derivatives depend only on inputs and tables: integrate with a cumulative sum
+            self._evaluate(namespace, skip=state_dependent)
+            trajectories = {}
+            for name, (code, _) in self.derivatives.items():
+                rate = np.broadcast_to(eval(code, _EVAL_GLOBALS, namespace), (n_steps,))
+                trajectories[name] = state[name] + dt * np.cumsum(rate)
+                state[name] = trajectories[name][-1] if n_steps else state[name]
+
+        namespace.update(trajectories)
+        self._evaluate(namespace)
+
+        if check_asserts:
+            for code, message in self.assertions:
+                ok = np.broadcast_to(eval(code, _EVAL_GLOBALS, namespace), (n_steps,))
+                if not ok.all():
+                    raise ModelAssertionError(f"{message} at t={times[np.argmin(ok)]:.0f}s")
+
+        variables = list(self.states) + [name for name, _, _ in self.assignments]
+        result = {name: np.broadcast_to(namespace[name], (n_steps,)) for name in variables}
+        result['time'] = times
+        return result, state
+
+class NativeModelicaInterface:
+    """
+    Drop-in replacement for CSVModelicaInterface driven by the parsed Modelica model.
+    Model time is the clock's seconds since midnight; the daily tables wrap around.
+    total_cost_inr integrates the model's total_cost rate ($/h) over each step, in ₹.
+    """
+    def __init__(self, model_path, clock=None):
+        self.model_path = model_path
+        self.clock = WallClock() if clock is None else clock
+        self.model = NativeModelicaModel(model_path)
+        self.state = dict(self.model.states)
+        self.current_state = {
+            'battery_soc': 50,
+            'solar_power': 0,
+            'load_power': 800,
+            'grid_power': 0,
+            'total_cost_inr': 0
+        }
+
+    def simulate_batch(self, setpoints, start=None, step_size=300, check_asserts=True):
+        """
+        Simulate N (battery_setpoint, generator_setpoint) steps; returns per-step outputs.
+        A violated model assert raises ModelAssertionError (unless check_asserts is False)
+        and leaves the plant and clock where they were.
+        """
+        setpoints = np.asarray(setpoints, dtype=float)
+        start = self.clock.now() if start is None else pd.Timestamp(start)
+        model_time = (start - start.normalize()).total_seconds()
+
+        trajectories, self.state = self.model.simulate(
+            {'battery_setpoint': setpoints[:, 0], 'generator_setpoint': setpoints[:, 1]},
+            start_time=model_time, step_size=step_size, initial_state=self.state, check_asserts=check_asserts
+        )
+        # total_cost is a rate in $/h: integrate it over each step and convert to ₹
+        cost_increment = trajectories['total_cost'] * step_size / 3600 * INR_PER_USD
+        trajectories['total_cost_inr'] = self.current_state['total_cost_inr'] + np.cumsum(cost_increment)
+
+        if len(setpoints):
+            self.current_state = {name: float(values[-1]) for name, values in trajectories.items()
+                                  if name in self.model.outputs or name == 'total_cost_inr'}
+            self.clock.advance(step_size * len(setpoints))
+        return trajectories
+
+    def simulate_step(self, battery_setpoint, generator_setpoint, step_size=300, check_asserts=True):
+        """Simulate one time step with given setpoints"""
+        self.simulate_batch([[battery_setpoint, generator_setpoint]], step_size=step_size,
+                            check_asserts=check_asserts)
+        return self.current_state
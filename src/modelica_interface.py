@@ -3,9 +3,47 @@ import numpy as np
 import os
 import time
 
+from clock import WallClock
+
+# Typical Indian electricity rates (₹/kWh) by hour of day
+PRICE_BY_HOUR = np.array([4.0] * 6 + [6.0] * 12 + [8.0] * 4 + [4.0] * 2)
+
+def daily_profiles(hours):
+    """Solar (W), load (W) and tariff (₹/kWh) for an array of hours of day"""
+    # Simple solar pattern based on time of day
+    solar_power = np.maximum(0, 3000 * np.sin(np.pi * (hours + 6) / 15))
+
+    # Simple load pattern
+    load_power = 800 + 2000 * np.exp(-0.5 * ((hours - 19) / 3)**2)
+
+    return solar_power, load_power, PRICE_BY_HOUR[hours]
+
+def clipped_cumsum(initial, deltas, lower, upper):
+    """
+    Running sum of deltas from initial, clipped to [lower, upper] after every step.
+    Each step is a map x -> clip(x + a, lo, hi); these maps compose in closed form,
+    so a log-depth prefix scan evaluates the whole trajectory with vectorized NumPy.
+    """
+    shift = np.array(deltas, dtype=float)
+    lo = np.full(len(shift), float(lower))
+    hi = np.full(len(shift), float(upper))
+
+    step = 1
+    while step < len(shift):
+        # Compose each map with the one `step` positions earlier (earlier map applied first)
+        new_shift = shift[:-step] + shift[step:]
+        new_lo = np.clip(lo[:-step] + shift[step:], lo[step:], hi[step:])
+        new_hi = np.clip(hi[:-step] + shift[step:], lo[step:], hi[step:])
+        shift[step:], lo[step:], hi[step:] = new_shift, new_lo, new_hi
+        step *= 2
+
+    return np.clip(initial + shift, lo, hi)
+
 class CSVModelicaInterface:
-    def __init__(self, model_path):
+    def __init__(self, model_path, clock=None):
         self.model_path = model_path
+        self.clock = WallClock() if clock is None else clock
+        self.battery_capacity = 10  # kWh
         self.current_state = {
             'battery_soc': 50,
             'solar_power': 0,
@@ -13,43 +51,29 @@ class CSVModelicaInterface:
             'grid_power': 0,
             'total_cost_inr': 0  # Changed to INR
         }
-    
+
     def simulate_step(self, battery_setpoint, generator_setpoint, step_size=300):
         """
         Simulate one time step with given setpoints
         Simplified version that doesn't require full Modelica integration
         """
         # Update battery SOC
-        battery_energy = self.current_state['battery_soc'] / 100 * 10  # kWh
+        battery_energy = self.current_state['battery_soc'] / 100 * self.battery_capacity  # kWh
         battery_energy += battery_setpoint * step_size / 3600 / 1000  # kWh
-        
+
         # Apply constraints
-        battery_energy = max(0, min(10000, battery_energy))
-        new_soc = battery_energy / 10  # %
-        
-        # Simple solar pattern based on time of day
-        from datetime import datetime
-        hour = datetime.now().hour
-        solar_power = 3000 * np.sin(np.pi * (hour + 6) / 15)
-        solar_power = max(0, solar_power)
-        
-        # Simple load pattern
-        load_power = 800 + 2000 * np.exp(-0.5 * ((hour - 19) / 3)**2)
-        
+        battery_energy = max(0, min(self.battery_capacity, battery_energy))
+        new_soc = battery_energy / self.battery_capacity * 100  # %
+
+        hour = self.clock.now().hour
+        solar_power, load_power, price = [float(v[0]) for v in daily_profiles(np.array([hour]))]
+
         # Calculate grid power
         grid_power = load_power - solar_power - battery_setpoint - generator_setpoint
-        
-        # Calculate cost in INR - typical Indian electricity rates
-        if 22 <= hour or hour < 6:  # Off-peak: 10 PM - 6 AM
-            price = 4.0  # ₹/kWh
-        elif 18 <= hour < 22:  # Peak: 6 PM - 10 PM
-            price = 8.0  # ₹/kWh
-        else:  # Normal: 6 AM - 6 PM
-            price = 6.0  # ₹/kWh
-            
-        cost_increment = (max(0, grid_power) * price + 
+
+        cost_increment = (max(0, grid_power) * price +
                          generator_setpoint * 20.0 / 0.35) * step_size / 3600 / 1000  # Fuel cost 20 ₹/kWh
-        
+
         # Update state
         self.current_state = {
             'battery_soc': new_soc,
@@ -58,5 +82,47 @@ class CSVModelicaInterface:
             'grid_power': grid_power,
             'total_cost_inr': self.current_state['total_cost_inr'] + cost_increment
         }
-        
-        return self.current_state
\ No newline at end of file
+        self.clock.advance(step_size)
+
+        return self.current_state
+
+    def simulate_batch(self, setpoints, start=None, step_size=300):
+        """
+        Simulate N steps in fast time with vectorized NumPy.
+        setpoints: array of shape (N, 2) holding (battery_setpoint, generator_setpoint) in W.
+        Returns a DataFrame of states indexed by the start time of each step.
+        """
+        setpoints = np.asarray(setpoints, dtype=float)
+        battery_setpoint, generator_setpoint = setpoints[:, 0], setpoints[:, 1]
+        n_steps = len(setpoints)
+
+        start = self.clock.now() if start is None else pd.Timestamp(start)
+        timestamps = pd.date_range(start=start, periods=n_steps, freq=pd.Timedelta(seconds=step_size))
+        hours = timestamps.hour.values
+
+        # Battery energy trajectory, clipped to [0, capacity] after every step
+        battery_energy = clipped_cumsum(
+            self.current_state['battery_soc'] / 100 * self.battery_capacity,
+            battery_setpoint * step_size / 3600 / 1000,
+            0, self.battery_capacity
+        )
+
+        solar_power, load_power, price = daily_profiles(hours)
+        grid_power = load_power - solar_power - battery_setpoint - generator_setpoint
+
+        cost_increment = (np.maximum(0, grid_power) * price +
+                          generator_setpoint * 20.0 / 0.35) * step_size / 3600 / 1000  # Fuel cost 20 ₹/kWh
+
+        states = pd.DataFrame({
+            'battery_soc': battery_energy / self.battery_capacity * 100,
+            'solar_power': solar_power,
+            'load_power': load_power,
+            'grid_power': grid_power,
+            'total_cost_inr': self.current_state['total_cost_inr'] + np.cumsum(cost_increment)
+        }, index=timestamps)
+
+        if n_steps:
+            self.current_state = states.iloc[-1].to_dict()
+            self.clock.advance(step_size * n_steps)
+
+        return states
@@ -1,5 +1,10 @@
+import os
 import numpy as np
-from scipy.optimize import minimize, Bounds, LinearConstraint
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from scipy.optimize import minimize, linprog, Bounds, LinearConstraint
+from scipy import sparse
 import pandas as pd
 
 class AdvancedMicroGridOptimizer:
@@ -15,104 +20,537 @@ class AdvancedMicroGridOptimizer:
         self.grid_export_price = 0.08  # $/kWh (feed-in tariff)
         self.carbon_intensity_grid = 0.5  # kgCO2/kWh
         self.carbon_intensity_generator = 0.7  # kgCO2/kWh
+        self.step_hours = 0.25  # default period length (h) when no time grid is given
+        self._soc_matrix_cache = {}
+        self._lp_cache = {}
+        self._slsqp_cache = {}
+        self._stochastic_cache = {}
+        self._controller = None
+        self.solution_cache = None  # optional SolutionCache in front of the controller, multi-objective and batch solves
+        self.last_status = None  # 'optimal', 'cached' or 'fallback': how the last multi-objective plan was made
         
-    def multi_objective_optimization(self, solar_forecast, load_forecast, current_soc, 
-                                   electricity_prices, carbon_cost=0.02):
+    def _steps(self, n_periods, step_hours=None):
+        """Period lengths in hours: uniform self.step_hours, a scalar, or one per period"""
+        if step_hours is None:
+            step_hours = self.step_hours
+        steps = np.broadcast_to(np.asarray(step_hours, dtype=float), (n_periods,))
+        steps.flags.writeable = False
+        return steps
+    
+    def _grid_key(self, steps):
+        """Hashable key of a time grid for the structure caches"""
+        return len(steps), steps.tobytes()
+    
+    def _soc_matrix(self, n_periods, step_hours=None):
+        """Sparse cumulative-sum matrix mapping battery power (kW) to energy drawn (kWh)"""
+        steps = self._steps(n_periods, step_hours)
+        key = self._grid_key(steps)
+        if key not in self._soc_matrix_cache:
+            # Column j accumulates the energy of period j: power * period length
+            self._soc_matrix_cache[key] = sparse.tril(
+                np.ones((n_periods, n_periods)) * steps, format='csr'
+            )
+        return self._soc_matrix_cache[key]
+    
+    def _dispatch_objective(self, solar_forecast, load_forecast, electricity_prices, carbon_cost,
+                            step_hours=None):
         """
-        Multi-objective optimization: minimize cost AND carbon emissions
+        Vectorized weighted cost/emissions objective returning (value, gradient).
+        Each period is weighted by its length relative to self.step_hours.
         """
-        n_periods = len(solar_forecast)
+        solar = np.asarray(solar_forecast, dtype=float)
+        load = np.asarray(load_forecast, dtype=float)
+        prices = np.asarray(electricity_prices, dtype=float)[:len(solar)]
+        n_periods = len(solar)
+        net_load = load - solar
+        weights = self._steps(n_periods, step_hours) / self.step_hours
         
-        # Decision variables: [battery_power, generator_power] for each period
-        # battery_power > 0: discharging, < 0: charging
-        n_vars = 2 * n_periods
+        # Per-kW marginal cost of generator output (fuel + carbon) in each period
+        generator_rate = weights * (self.fuel_cost / self.generator_efficiency +
+                                    carbon_cost * self.carbon_intensity_generator) / 1000
+        import_rate = weights * (prices + carbon_cost * self.carbon_intensity_grid) / 1000
+        export_rate = weights * self.grid_export_price / 1000
         
-        # Objective function: weighted sum of cost and emissions
         def objective(x):
-            cost = 0
-            emissions = 0
+            battery_power = x[:n_periods]
+            generator_power = x[n_periods:]
             
-            for i in range(n_periods):
-                battery_power = x[i]
-                generator_power = x[i + n_periods]
-                
-                # Grid power balance
-                grid_power = load_forecast[i] - solar_forecast[i] - battery_power - generator_power
-                
-                # Cost calculation
-                if grid_power > 0:  # Importing from grid
-                    cost += grid_power * electricity_prices[i] / 1000  # Convert to $
-                else:  # Exporting to grid
-                    cost += grid_power * self.grid_export_price / 1000  # Negative cost
-                
-                # Generator fuel cost
-                cost += (generator_power * self.fuel_cost / self.generator_efficiency) / 1000
-                
-                # Carbon emissions
-                emissions += max(0, grid_power) * self.carbon_intensity_grid / 1000
-                emissions += generator_power * self.carbon_intensity_generator / 1000
+            # Grid power balance
+            grid_power = net_load - battery_power - generator_power
+            
+            # Importing pays price + carbon, exporting earns the feed-in tariff
+            grid_rate = np.where(grid_power > 0, import_rate, export_rate)
+            value = grid_rate @ grid_power + generator_rate @ generator_power
+            
+            # Subgradient: d(grid_power)/dx = -1 for both battery and generator
+            grad = np.empty_like(x)
+            grad[:n_periods] = -grid_rate
+            grad[n_periods:] = generator_rate - grid_rate
+            return value, grad
+        
+        return objective
+    
+    def _lp_structure(self, n_periods, step_hours=None):
+        """
+        Constant sparse LP equality matrix over [battery, generator, grid_import, grid_export, energy].
+        Battery energy is tracked as explicit state so the SOC recursion stays bidiagonal
+        instead of a dense cumulative-sum triangle.
+        """
+        steps = self._steps(n_periods, step_hours)
+        key = self._grid_key(steps)
+        if key not in self._lp_cache:
+            identity = sparse.identity(n_periods, format='csr')
+            empty = sparse.csr_matrix((n_periods, n_periods))
+            
+            # Power balance: battery + generator + import - export = load - solar
+            balance = sparse.hstack([identity, identity, identity, -identity, empty])
+            
+            # Energy recursion: energy[i] - energy[i-1] + battery[i] * step[i] = 0
+            difference = sparse.eye(n_periods, format='csr') - sparse.eye(n_periods, k=-1, format='csr')
+            dynamics = sparse.hstack([sparse.diags(steps, format='csr'), empty, empty, empty, difference])
             
-            # Weighted objective (cost + carbon_cost * emissions)
-            return cost + carbon_cost * emissions
+            A_eq = sparse.vstack([balance, dynamics], format='csr')
+            self._lp_cache[key] = A_eq
+        return self._lp_cache[key]
+    
+    def lp_optimization(self, solar_forecast, load_forecast, current_soc,
+                        electricity_prices, carbon_cost=0.02, time_limit=None, step_hours=None):
+        """
+        Exact LP formulation of the dispatch problem solved with HiGHS.
+        Splitting grid power into non-negative import/export makes the problem linear.
+        """
+        n_periods = len(solar_forecast)
+        result = self.solve_lp(solar_forecast, load_forecast, current_soc,
+                               electricity_prices, carbon_cost, time_limit, step_hours)
+        
+        if result.status == 0:
+            battery_power = result.x[:n_periods]
+            generator_power = result.x[n_periods:2 * n_periods]
+            return battery_power, generator_power
+        else:
+            # Fallback to simple optimization
+            return self.simple_optimization(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                            step_hours)
+    
+    def _lp_data(self, solar_forecast, load_forecast, current_soc, electricity_prices, carbon_cost,
+                 step_hours=None):
+        """Cost vector, equality right-hand side and variable bounds of the dispatch LP"""
+        n_periods = len(solar_forecast)
+        net_load = np.asarray(load_forecast, dtype=float) - np.asarray(solar_forecast, dtype=float)
+        prices = np.asarray(electricity_prices, dtype=float)[:n_periods]
+        weights = self._steps(n_periods, step_hours) / self.step_hours
         
-        # Constraints
-        constraints = []
+        # Cost vector: generator fuel + carbon, import price + carbon, export earns feed-in tariff
+        generator_rate = (self.fuel_cost / self.generator_efficiency +
+                          carbon_cost * self.carbon_intensity_generator) / 1000
+        c = np.concatenate([
+            np.zeros(n_periods),
+            weights * generator_rate,
+            weights * (prices + carbon_cost * self.carbon_intensity_grid) / 1000,
+            weights * -self.grid_export_price / 1000,
+            np.zeros(n_periods)
+        ])
         
-        # Power balance constraint (handled in objective)
+        # Only the first energy step depends on the initial state of charge
+        b_eq = np.concatenate([net_load, np.zeros(n_periods)])
+        b_eq[n_periods] = current_soc / 100 * self.battery_capacity
         
-        # Battery SOC constraints
-        soc_trajectory = [current_soc / 100 * self.battery_capacity]  # Start with current SOC in kWh
+        lower = np.concatenate([
+            np.full(n_periods, -self.battery_max_power),
+            np.full(n_periods, self.generator_min_power),
+            np.zeros(2 * n_periods),
+            np.full(n_periods, self.battery_min_soc / 100 * self.battery_capacity)
+        ])
+        upper = np.concatenate([
+            np.full(n_periods, self.battery_max_power),
+            np.full(n_periods, self.generator_max_power),
+            np.full(2 * n_periods, np.inf),
+            np.full(n_periods, self.battery_max_soc / 100 * self.battery_capacity)
+        ])
         
-        for i in range(n_periods):
-            next_soc = soc_trajectory[-1] - x[i] / 4  # 15-minute time step assumption
-            soc_trajectory.append(next_soc)
+        return c, b_eq, lower, upper
+    
+    def solve_lp(self, solar_forecast, load_forecast, current_soc,
+                 electricity_prices, carbon_cost=0.02, time_limit=None, step_hours=None):
+        """
+        Solve the dispatch LP with HiGHS and return the raw scipy result.
+        step_hours: period length(s) in hours, scalar or one per period (default self.step_hours)
+        """
+        A_eq = self._lp_structure(len(solar_forecast), step_hours)
+        c, b_eq, lower, upper = self._lp_data(solar_forecast, load_forecast, current_soc,
+                                              electricity_prices, carbon_cost, step_hours)
+        
+        options = {} if time_limit is None else {'time_limit': time_limit}
+        return linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=np.column_stack([lower, upper]),
+                       method='highs', options=options)
+    
+    def _stochastic_structure(self, n_periods, n_scenarios, first_stage_periods, step_hours=None):
+        """
+        Block-diagonal scenario LP plus non-anticipativity rows forcing every scenario
+        to share the battery/generator setpoints of the first-stage periods.
+        """
+        key = (self._grid_key(self._steps(n_periods, step_hours)), n_scenarios, first_stage_periods)
+        if key not in self._stochastic_cache:
+            block = self._lp_structure(n_periods, step_hours)
+            scenarios = sparse.kron(sparse.identity(n_scenarios), block)
+            
+            # Selector picking battery[:m] and generator[:m] out of one scenario block
+            m = first_stage_periods
+            columns = np.concatenate([np.arange(m), n_periods + np.arange(m)])
+            selector = sparse.csr_matrix((np.ones(2 * m), (np.arange(2 * m), columns)),
+                                         shape=(2 * m, 5 * n_periods))
+            
+            # x_k[first stage] - x_0[first stage] = 0 for every other scenario k
+            anticipativity = sparse.hstack([
+                sparse.kron(np.ones((n_scenarios - 1, 1)), -selector),
+                sparse.kron(sparse.identity(n_scenarios - 1), selector)
+            ])
+            
+            self._stochastic_cache[key] = sparse.vstack([scenarios, anticipativity], format='csr')
+        return self._stochastic_cache[key]
+    
+    def stochastic_optimization(self, solar_scenarios, load_scenarios, current_soc,
+                                electricity_prices, carbon_cost=0.02, first_stage_periods=1,
+                                time_limit=None, step_hours=None):
+        """
+        Two-stage scenario LP: minimize expected cost over K equally likely (solar, load)
+        scenarios, with shared first-stage setpoints and per-scenario recourse afterwards.
+        Returns (battery_power, generator_power): the shared first-stage setpoints followed
+        by the scenario-average recourse plan.
+        """
+        solar_scenarios = np.atleast_2d(np.asarray(solar_scenarios, dtype=float))
+        load_scenarios = np.atleast_2d(np.asarray(load_scenarios, dtype=float))
+        n_scenarios, n_periods = solar_scenarios.shape
+        
+        if n_scenarios == 1:
+            return self.lp_optimization(solar_scenarios[0], load_scenarios[0], current_soc,
+                                        electricity_prices, carbon_cost, time_limit, step_hours)
+        
+        A_eq = self._stochastic_structure(n_periods, n_scenarios, first_stage_periods, step_hours)
+        c, b_eq, lower, upper = self._lp_data(solar_scenarios[0], load_scenarios[0], current_soc,
+                                              electricity_prices, carbon_cost, step_hours)
+        
+        # Only the power balance differs between scenarios
+        scenario_b_eq = np.tile(b_eq, (n_scenarios, 1))
+        scenario_b_eq[:, :n_periods] = load_scenarios - solar_scenarios
+        b_eq = np.concatenate([scenario_b_eq.ravel(), np.zeros(2 * first_stage_periods * (n_scenarios - 1))])
+        bounds = np.column_stack([np.tile(lower, n_scenarios), np.tile(upper, n_scenarios)])
+        
+        options = {} if time_limit is None else {'time_limit': time_limit}
+        result = linprog(np.tile(c, n_scenarios) / n_scenarios, A_eq=A_eq, b_eq=b_eq,
+                         bounds=bounds, method='highs', options=options)
+        
+        if result.status == 0:
+            plans = result.x.reshape(n_scenarios, 5 * n_periods)
+            battery_power = plans[:, :n_periods].mean(axis=0)
+            generator_power = plans[:, n_periods:2 * n_periods].mean(axis=0)
+            return battery_power, generator_power
+        else:
+            # Fallback to simple optimization on the mean scenario
+            return self.simple_optimization(solar_scenarios.mean(axis=0), load_scenarios.mean(axis=0),
+                                            current_soc, electricity_prices, step_hours)
+    
+    def multi_objective_optimization(self, solar_forecast, load_forecast, current_soc, 
+                                   electricity_prices, carbon_cost=0.02, solver='slsqp',
+                                   time_limit=None, step_hours=None):
+        """
+        Multi-objective optimization: minimize cost AND carbon emissions
+        solver: 'slsqp' (nonlinear, default) or 'lp' (exact HiGHS linear program)
+        time_limit: optional solver time budget in seconds
+        step_hours: period length(s) in hours, scalar or one per period (see TimeGrid)
+        With a solution_cache attached, repeated (quantized) problems skip the solve and
+        plans cached for an adjacent SOC bucket warm-start SLSQP.
+        """
+        if solver not in ('slsqp', 'lp'):
+            raise ValueError(f"Unknown solver: {solver}")
+        
+        cache = self.solution_cache
+        x0 = None
+        if cache is not None:
+            key = self._cache_key(solver, solar_forecast, load_forecast, current_soc, electricity_prices,
+                                  carbon_cost, step_hours)
+            plan = self._cached_plan(key, current_soc, step_hours)
+            if plan is not None:
+                self.last_status = 'cached'
+                return plan[0].copy(), plan[1].copy()
+            x0 = cache.warm_start(key)
+        
+        n_periods = len(solar_forecast)
+        if solver == 'lp':
+            result = self.solve_lp(solar_forecast, load_forecast, current_soc,
+                                   electricity_prices, carbon_cost, time_limit, step_hours)
+            success = result.status == 0
+        else:
+            result = self.solve_slsqp(solar_forecast, load_forecast, current_soc,
+                                      electricity_prices, carbon_cost, x0=x0, time_limit=time_limit,
+                                      step_hours=step_hours)
+            success = result.success
+        
+        if success:
+            battery_power = result.x[:n_periods]
+            generator_power = result.x[n_periods:2 * n_periods]
+            if cache is not None:
+                cache.put(key, battery_power, generator_power)
+            self.last_status = 'optimal'
+            return battery_power, generator_power
+        else:
+            # Fallback to simple optimization (not cached: a later solve may succeed)
+            self.last_status = 'fallback'
+            return self.simple_optimization(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                            step_hours)
+    
+    def feasible(self, plan, current_soc, tolerance=1e-6, step_hours=None):
+        """Whether a [battery_power, generator_power] plan respects the power and SOC limits"""
+        n_periods = len(plan) // 2
+        battery_power, generator_power = plan[:n_periods], plan[n_periods:]
+        soc_matrix = self._soc_matrix(n_periods, step_hours)
+        energy = current_soc / 100 * self.battery_capacity - soc_matrix @ battery_power
+        return bool(
+            np.all(np.abs(battery_power) <= self.battery_max_power + tolerance) and
+            np.all(generator_power >= self.generator_min_power - tolerance) and
+            np.all(generator_power <= self.generator_max_power + tolerance) and
+            np.all(energy >= self.battery_min_soc / 100 * self.battery_capacity - tolerance) and
+            np.all(energy <= self.battery_max_soc / 100 * self.battery_capacity + tolerance)
+        )
+    
+    def _cached_plan(self, key, current_soc, step_hours=None):
+        """
+        Plan cached under key if it is feasible from this exact SOC (a hit may have been
+        solved for another SOC in the same bucket), else None
+        """
+        return self.solution_cache.get(
+            key, valid=lambda plan: self.feasible(np.concatenate(plan), current_soc, step_hours=step_hours)
+        )
+    
+    def _cache_key(self, solver, solar_forecast, load_forecast, current_soc, electricity_prices,
+                   carbon_cost, step_hours=None):
+        """solution_cache key of a problem, including the solver and every setting the plan depends on"""
+        steps = tuple(float(step) for step in self._steps(len(solar_forecast), step_hours))
+        return self.solution_cache.key(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                       (solver, float(carbon_cost), steps, self._parameters()))
+    
+    def _parameters(self):
+        """Scalar settings a plan depends on, as a hashable tuple"""
+        return tuple(sorted((name, value) for name, value in vars(self).items()
+                            if not name.startswith('_') and isinstance(value, (int, float))))
+    
+    def _slsqp_structure(self, n_periods, step_hours=None):
+        """
+        Constant SLSQP Jacobian of the SOC limits. SLSQP only works on dense matrices, so
+        this is the one dense n x 2n block; long horizons belong on the LP (see
+        RecedingHorizonController.slsqp_max_periods).
+        """
+        key = self._grid_key(self._steps(n_periods, step_hours))
+        if key not in self._slsqp_cache:
+            soc_matrix = self._soc_matrix(n_periods, step_hours).toarray()
+            
+            soc_jac = np.zeros((2 * n_periods, 2 * n_periods))
+            soc_jac[:n_periods, :n_periods] = -soc_matrix
+            soc_jac[n_periods:, :n_periods] = soc_matrix
+            
+            self._slsqp_cache[key] = soc_jac
+        return self._slsqp_cache[key]
+    
+    def solve_slsqp(self, solar_forecast, load_forecast, current_soc,
+                    electricity_prices, carbon_cost=0.02, x0=None, time_limit=None, step_hours=None):
+        """
+        Solve the dispatch problem with SLSQP and return the raw scipy result.
+        x0 optionally warm-starts the solver from a previous plan; time_limit stops
+        it (unsuccessfully) once the budget in seconds is spent. step_hours gives the
+        period length(s) in hours (default self.step_hours).
+        """
+        n_periods = len(solar_forecast)
         
-        # Bounds
+        # Decision variables: [battery_power, generator_power] for each period
+        # battery_power > 0: discharging, < 0: charging
+        n_vars = 2 * n_periods
+        
+        # Objective function: weighted sum of cost and emissions, with exact (sub)gradient
+        objective = self._dispatch_objective(solar_forecast, load_forecast,
+                                             electricity_prices, carbon_cost, step_hours)
+        
+        # Bounds (the generator minimum is a bound, not a constraint row, as in the LP)
         bounds = Bounds(
-            [-self.battery_max_power] * n_periods + [0] * n_periods,  # Lower bounds
+            [-self.battery_max_power] * n_periods + [self.generator_min_power] * n_periods,  # Lower bounds
             [self.battery_max_power] * n_periods + [self.generator_max_power] * n_periods  # Upper bounds
         )
         
-        # SOC constraints (20%-95%)
-        def soc_constraint(x):
-            soc = current_soc / 100 * self.battery_capacity
-            constraints = []
-            
-            for i in range(n_periods):
-                soc -= x[i] / 4  # 15-minute time step
-                constraints.append(soc - self.battery_min_soc/100 * self.battery_capacity)  # Min SOC
-                constraints.append(self.battery_max_soc/100 * self.battery_capacity - soc)  # Max SOC
-            
-            return np.array(constraints)
+        # SOC constraints (20%-95%): soc = soc0 - L @ battery_power, L lower-triangular
+        soc_matrix = self._soc_matrix(n_periods, step_hours)
+        soc_jac = self._slsqp_structure(n_periods, step_hours)
+        initial_energy = current_soc / 100 * self.battery_capacity
+        min_energy = self.battery_min_soc / 100 * self.battery_capacity
+        max_energy = self.battery_max_soc / 100 * self.battery_capacity
         
-        # Generator minimum power constraint
-        def generator_constraint(x):
-            return x[n_periods:] - self.generator_min_power  # Generator power >= min_power
+        def soc_constraint(x):
+            energy = initial_energy - soc_matrix @ x[:n_periods]
+            return np.concatenate([energy - min_energy, max_energy - energy])
         
         constraints = [
-            {'type': 'ineq', 'fun': soc_constraint},
-            {'type': 'ineq', 'fun': generator_constraint}
+            {'type': 'ineq', 'fun': soc_constraint, 'jac': lambda x: soc_jac}
         ]
         
         # Initial guess
-        x0 = np.zeros(n_vars)
+        if x0 is None:
+            x0 = np.zeros(n_vars)
+        
+        callback = None
+        if time_limit is not None:
+            deadline = time.perf_counter() + time_limit
+            
+            def callback(xk):
+                if time.perf_counter() > deadline:
+                    raise StopIteration
+        
+        # SLSQP's ftol is absolute, and the objective (money per W-step) is tiny: scale it so
+        # the gradient is O(1), otherwise it stops early on the first kink of the objective
+        scale = 1 / max(np.abs(objective(x0)[1]).max(), 1e-12)
+        
+        def scaled_objective(x):
+            value, grad = objective(x)
+            return value * scale, grad * scale
         
         # Solve optimization
-        result = minimize(objective, x0, method='SLSQP', bounds=bounds, 
-                         constraints=constraints, options={'maxiter': 1000})
+        result = minimize(scaled_objective, x0, method='SLSQP', jac=True, bounds=bounds,
+                          constraints=constraints, options={'maxiter': 1000}, callback=callback)
+        result.fun /= scale
+        result.jac /= scale
+        return result
+    
+    def plan_metrics(self, solar_forecast, load_forecast, electricity_prices, battery_power,
+                     generator_power, step_hours=None):
+        """
+        Operating cost and emissions (kgCO2) of plans over the horizon.
+        Plans may be stacked as (K, n_periods) arrays; returns (cost, emissions) per plan.
+        """
+        n_periods = len(solar_forecast)
+        steps = self._steps(n_periods, step_hours)
+        net_load = np.asarray(load_forecast, dtype=float) - np.asarray(solar_forecast, dtype=float)
+        prices = np.asarray(electricity_prices, dtype=float)[:n_periods]
         
-        if result.success:
-            battery_power = result.x[:n_periods]
-            generator_power = result.x[n_periods:]
-            return battery_power, generator_power
-        else:
-            # Fallback to simple optimization
-            return self.simple_optimization(solar_forecast, load_forecast, current_soc, electricity_prices)
+        grid_power = net_load - np.asarray(battery_power) - np.asarray(generator_power)
+        grid_import = np.maximum(0, grid_power)
+        grid_export = np.maximum(0, -grid_power)
+        
+        cost = (grid_import * prices - grid_export * self.grid_export_price +
+                generator_power * self.fuel_cost / self.generator_efficiency) @ steps / 1000
+        emissions = (grid_import * self.carbon_intensity_grid +
+                     generator_power * self.carbon_intensity_generator) @ steps / 1000
+        return cost, emissions
+    
+    def _sweep_chunk(self, problem, carbon_costs, solver, step_hours):
+        """Solve one problem for consecutive carbon weights, each warm-starting the next"""
+        solar_forecast, load_forecast, current_soc, electricity_prices = problem
+        n_periods = len(solar_forecast)
+        rows, x0 = [], None
+        for carbon_cost in carbon_costs:
+            start = time.perf_counter()
+            if solver == 'lp':
+                result = self.solve_lp(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                       carbon_cost, step_hours=step_hours)
+                success = result.status == 0
+            else:
+                result = self.solve_slsqp(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                          carbon_cost, x0=x0, step_hours=step_hours)
+                if x0 is not None and result.nit <= 1:
+                    # The objective is piecewise linear, so SLSQP can stall on the
+                    # neighbour's kink; solve this weight cold instead
+                    result = self.solve_slsqp(solar_forecast, load_forecast, current_soc, electricity_prices,
+                                              carbon_cost, step_hours=step_hours)
+                success = bool(result.success)
+            solve_time = time.perf_counter() - start
+            
+            if success:
+                plan = result.x[:2 * n_periods]
+                x0 = plan
+            else:
+                # Fallback to simple optimization
+                plan = np.concatenate(self.simple_optimization(solar_forecast, load_forecast, current_soc,
+                                                               electricity_prices, step_hours))
+            rows.append((plan, solve_time, result.nit, success))
+        return rows
     
-    def simple_optimization(self, solar_forecast, load_forecast, current_soc, electricity_prices):
+    def pareto_sweep(self, solar_forecast, load_forecast, current_soc, electricity_prices,
+                     carbon_costs, solver='lp', max_workers=None, step_hours=None, executor='process',
+                     tolerance=1e-6):
+        """
+        Solve the dispatch for a grid of carbon weights and return the cost/emissions trade-off.
+        Sorted weights are split into contiguous chunks solved in parallel; within a chunk
+        each SLSQP solve warm-starts from its neighbouring weight's plan (the default exact
+        LP has no warm start through linprog). The constant problem structure is built once
+        per worker ('process', the default, as the solvers hold the GIL) or once and
+        shared ('thread'). Points within a relative tolerance of a cheaper point's
+        emissions are not on the front.
+        Returns a dict with 'points' (DataFrame: carbon_cost, cost, emissions, solve_time,
+        iterations, success, pareto), 'front' (Pareto-optimal points sorted by cost),
+        'plans' (carbon_cost -> (battery_power, generator_power)) and 'seconds'.
+        """
+        if solver not in ('slsqp', 'lp'):
+            raise ValueError(f"Unknown solver: {solver}")
+        
+        start = time.perf_counter()
+        carbon_costs = np.sort(np.asarray(carbon_costs, dtype=float))
+        n_periods = len(solar_forecast)
+        
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"Unknown executor: {executor}")
+        
+        # Fill the structure caches up front so worker threads only read them
+        if executor == 'thread':
+            if solver == 'lp':
+                self._lp_structure(n_periods, step_hours)
+            else:
+                self._slsqp_structure(n_periods, step_hours)
+        
+        n_workers = min(max_workers or os.cpu_count(), len(carbon_costs))
+        chunks = np.array_split(carbon_costs, n_workers)
+        problem = (solar_forecast, load_forecast, current_soc, electricity_prices)
+        if n_workers == 1:
+            rows = self._sweep_chunk(problem, carbon_costs, solver, step_hours)
+        elif executor == 'thread':
+            with ThreadPoolExecutor(n_workers) as pool:
+                futures = [pool.submit(self._sweep_chunk, problem, chunk, solver, step_hours) for chunk in chunks]
+                rows = [row for future in futures for row in future.result()]
+        elif executor == 'process':
+            settings = dict(self._parameters())
+            with ProcessPoolExecutor(n_workers) as pool:
+                futures = [pool.submit(_sweep_chunk_in_process, settings, problem, chunk, solver, step_hours)
+                           for chunk in chunks]
+                rows = [row for future in futures for row in future.result()]
+        
+        plans = np.stack([row[0] for row in rows])
+        cost, emissions = self.plan_metrics(solar_forecast, load_forecast, electricity_prices,
+                                            plans[:, :n_periods], plans[:, n_periods:], step_hours)
+        
+        # A point is on the front if no cheaper (or equally cheap) point emits as little;
+        # emissions are non-negative, so the relative margin scales the running minimum
+        order = np.lexsort((emissions, cost))
+        best_before = np.concatenate([[np.inf], np.minimum.accumulate(emissions[order])[:-1]])
+        pareto = np.empty(len(rows), dtype=bool)
+        pareto[order] = emissions[order] < best_before * (1 - tolerance)
+        
+        points = pd.DataFrame({
+            'carbon_cost': carbon_costs,
+            'cost': cost,
+            'emissions': emissions,
+            'solve_time': [row[1] for row in rows],
+            'iterations': [row[2] for row in rows],
+            'success': [row[3] for row in rows],
+            'pareto': pareto
+        })
+        return {
+            'points': points,
+            'front': points[points['pareto']].sort_values('cost').reset_index(drop=True),
+            'plans': {weight: (plan[:n_periods], plan[n_periods:]) for weight, plan in zip(carbon_costs, plans)},
+            'seconds': time.perf_counter() - start
+        }
+    
+    def simple_optimization(self, solar_forecast, load_forecast, current_soc, electricity_prices,
+                            step_hours=None):
         """Fallback optimization method"""
         # Simplified optimization logic (similar to previous version)
         n_periods = len(solar_forecast)
+        steps = self._steps(n_periods, step_hours)
         battery_power = np.zeros(n_periods)
         generator_power = np.zeros(n_periods)
         
@@ -123,7 +561,7 @@ class AdvancedMicroGridOptimizer:
                 # Use battery first
                 available_battery = min(self.battery_max_power, 
                                       (current_soc/100 * self.battery_capacity - 
-                                       self.battery_min_soc/100 * self.battery_capacity) * 4)
+                                       self.battery_min_soc/100 * self.battery_capacity) / steps[i])
                 battery_discharge = min(imbalance, available_battery)
                 battery_power[i] = battery_discharge
                 imbalance -= battery_discharge
@@ -136,12 +574,12 @@ class AdvancedMicroGridOptimizer:
                 # Charge battery
                 available_charging = min(self.battery_max_power,
                                        (self.battery_max_soc/100 * self.battery_capacity - 
-                                        current_soc/100 * self.battery_capacity) * 4)
+                                        current_soc/100 * self.battery_capacity) / steps[i])
                 battery_charge = min(-imbalance, available_charging)
                 battery_power[i] = -battery_charge
             
             # Update SOC for next time step
-            current_soc -= battery_power[i] / self.battery_capacity * 100 / 4
+            current_soc -= battery_power[i] * steps[i] / self.battery_capacity * 100
         
         return battery_power, generator_power
     
@@ -156,11 +594,159 @@ class AdvancedMicroGridOptimizer:
         short_solar = forecast['solar'][:4]
         short_load = forecast['load'][:4]
         short_prices = forecast['prices'][:4]
+        step_hours = forecast.get('step_hours')
+        if step_hours is not None:
+            step_hours = self._steps(len(forecast['solar']), step_hours)[:len(short_solar)]
         
-        # Run optimization for short horizon
-        battery_power, generator_power = self.multi_objective_optimization(
-            short_solar, short_load, current_soc, short_prices
+        # Run warm-started optimization for short horizon
+        if self._controller is None:
+            self._controller = RecedingHorizonController(self, horizon=4)
+        battery_power, generator_power = self._controller.step(
+            short_solar, short_load, current_soc, short_prices, step_hours=step_hours
         )
         
         # Return first step actions
-        return battery_power[0], generator_power[0]
\ No newline at end of file
+        return battery_power[0], generator_power[0]
+
+
+class RecedingHorizonController:
+    """
+    Warm-started receding-horizon MPC around AdvancedMicroGridOptimizer.
+    Keeps the previous plan, shifts it one step as the next initial guess and
+    reuses the optimizer's cached constraint structures across cycles. With a
+    solution_cache on the optimizer, repeated problems reuse their cached plan.
+    Horizons longer than slsqp_max_periods are solved as the exact LP: SLSQP works on
+    dense matrices, so its cost grows steeply with the horizon.
+    """
+    def __init__(self, optimizer, horizon=None, carbon_cost=0.02, slsqp_max_periods=48):
+        self.optimizer = optimizer
+        self.horizon = horizon
+        self.carbon_cost = carbon_cost
+        self.slsqp_max_periods = slsqp_max_periods  # None: always SLSQP
+        self.previous_plan = None
+        self.cycle_stats = deque(maxlen=1000)  # per-cycle solve stats, most recent last
+    
+    def reset(self):
+        """Discard the stored plan so the next cycle starts cold"""
+        self.previous_plan = None
+    
+    def warm_start(self, n_periods):
+        """Previous plan shifted one step, repeating the final setpoint"""
+        if self.previous_plan is None or len(self.previous_plan) != 2 * n_periods:
+            return None
+        
+        battery_power = self.previous_plan[:n_periods]
+        generator_power = self.previous_plan[n_periods:]
+        return np.concatenate([
+            battery_power[1:], battery_power[-1:],
+            generator_power[1:], generator_power[-1:]
+        ])
+    
+    def feasible(self, plan, current_soc, tolerance=1e-6, step_hours=None):
+        """Whether a [battery_power, generator_power] plan respects the power and SOC limits"""
+        return self.optimizer.feasible(plan, current_soc, tolerance, step_hours)
+    
+    def step(self, solar_forecast, load_forecast, current_soc, electricity_prices, carbon_cost=None,
+             time_limit=None, step_hours=None):
+        """
+        Solve one control cycle and return the full (battery_power, generator_power) plan.
+        With a time_limit (seconds) the solve is anytime: if it does not converge in time,
+        the cheapest feasible candidate among the last iterate and the shifted previous
+        plan is applied, and the greedy dispatch if neither is feasible.
+        """
+        if carbon_cost is None:
+            carbon_cost = self.carbon_cost
+        
+        if self.horizon is not None:
+            solar_forecast = solar_forecast[:self.horizon]
+            load_forecast = load_forecast[:self.horizon]
+        electricity_prices = electricity_prices[:len(solar_forecast)]
+        n_periods = len(solar_forecast)
+        if step_hours is not None and np.ndim(step_hours):
+            step_hours = step_hours[:n_periods]
+        
+        solver = 'slsqp'
+        if self.slsqp_max_periods is not None and n_periods > self.slsqp_max_periods:
+            solver = 'lp'
+        
+        # A (quantized) problem already solved, e.g. an identical earlier cycle, skips the solve
+        cache = self.optimizer.solution_cache
+        cached = None
+        if cache is not None:
+            key = self.optimizer._cache_key(solver, solar_forecast, load_forecast, current_soc,
+                                            electricity_prices, carbon_cost, step_hours)
+            cached = self.optimizer._cached_plan(key, current_soc, step_hours)
+        
+        x0 = self.warm_start(n_periods)
+        if x0 is None and cache is not None and cached is None:
+            x0 = cache.warm_start(key)
+        start = time.perf_counter()
+        if cached is not None or (time_limit is not None and time_limit <= 0):
+            # Cached plan, or no budget left this cycle: skip the solve entirely
+            result = None
+        elif solver == 'lp':
+            result = self.optimizer.solve_lp(solar_forecast, load_forecast, current_soc,
+                                             electricity_prices, carbon_cost, time_limit=time_limit,
+                                             step_hours=step_hours)
+        else:
+            result = self.optimizer.solve_slsqp(solar_forecast, load_forecast, current_soc,
+                                                electricity_prices, carbon_cost, x0=x0,
+                                                time_limit=time_limit, step_hours=step_hours)
+        solve_time = time.perf_counter() - start
+        success = cached is not None or (result is not None and bool(result.success))
+        deadline_missed = time_limit is not None and not success and solve_time >= time_limit
+        
+        # The LP's solution also holds grid import/export and energy: keep [battery, generator]
+        iterate = None if result is None or result.x is None else result.x[:2 * n_periods]
+        plan, fallback = None, None
+        if cached is not None:
+            plan = np.concatenate(cached)
+        elif success:
+            plan = iterate
+            if cache is not None:
+                cache.put(key, plan[:n_periods], plan[n_periods:])
+        elif deadline_missed:
+            objective = self.optimizer._dispatch_objective(solar_forecast, load_forecast,
+                                                           electricity_prices, carbon_cost, step_hours)
+            candidates = [(name, x) for name, x in (('iterate', iterate),
+                                                    ('shifted', x0))
+                          if x is not None and self.feasible(x, current_soc, step_hours=step_hours)]
+            if candidates:
+                fallback, plan = min(candidates, key=lambda candidate: objective(candidate[1])[0])
+        
+        if plan is not None:
+            battery_power = plan[:n_periods]
+            generator_power = plan[n_periods:]
+        else:
+            # Fallback to simple optimization
+            fallback = 'greedy'
+            battery_power, generator_power = self.optimizer.simple_optimization(
+                solar_forecast, load_forecast, current_soc, electricity_prices, step_hours
+            )
+        
+        self.previous_plan = np.concatenate([battery_power, generator_power])
+        self.cycle_stats.append({
+            'solver': solver,
+            'iterations': 0 if result is None else result.nit,
+            'solve_time': solve_time,
+            'warm_start': x0 is not None and solver == 'slsqp' and cached is None,
+            'cached': cached is not None,
+            'success': success,
+            'deadline_missed': deadline_missed,
+            'fallback': fallback
+        })
+        
+        return battery_power, generator_power
+
+
+# Per-process optimizer for pareto_sweep workers, rebuilt only when the settings change
+_sweep_optimizer = None
+_sweep_settings = None
+
+def _sweep_chunk_in_process(settings, problem, carbon_costs, solver, step_hours):
+    global _sweep_optimizer, _sweep_settings
+    if _sweep_settings != settings:
+        _sweep_optimizer = AdvancedMicroGridOptimizer()
+        vars(_sweep_optimizer).update(settings)
+        _sweep_settings = settings
+    return _sweep_optimizer._sweep_chunk(problem, carbon_costs, solver, step_hours)
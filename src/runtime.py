@@ -0,0 +1,186 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+class TwinRuntime:
+    """
+    asyncio runtime around AdvancedMicroGridDigitalTwin.
+
+    Four concurrent stages:
+    - forecast refresh on its own cadence; the control tick always uses the latest
+      forecast, so a slow refresh never stalls it
+    - control tick: apply bus commands, solve in an executor (under the optimize latency
+      budget), simulate, publish on the twin's telemetry bus (if any), then hand the
+      record and the measured solar/load to the queues below
+    - telemetry ingestion: measurements are folded into the forecaster in batches
+    - history persistence: records are appended to the in-memory history and the store
+
+    Queues are bounded; a producer that outruns its consumer waits (backpressure)
+    instead of growing memory without limit.
+    """
+    def __init__(self, twin, control_period=1.0, forecast_period=900.0, queue_size=256,
+                 solve_executor=None, ingest_batch=64):
+        self.twin = twin
+        self.control_period = control_period
+        self.forecast_period = forecast_period
+        self.queue_size = queue_size
+        self.ingest_batch = ingest_batch
+
+        # Forecasts and online updates share the forecaster, so they run on one thread;
+        # solves mutate the warm-start controller, so they get their own single thread
+        self.solve_executor = ThreadPoolExecutor(1) if solve_executor is None else solve_executor
+        self.model_executor = ThreadPoolExecutor(1)
+
+        self.telemetry = None
+        self.records = None
+        self.forecast = None  # (issued at, solar, load, prices, scenarios)
+        self.stats = {
+            'ticks': 0,
+            'forecast_refreshes': 0,
+            'observations_ingested': 0,
+            'records_persisted': 0,
+            'max_telemetry_depth': 0,
+            'max_record_depth': 0
+        }
+        self._stopping = None
+
+    async def _in_executor(self, executor, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    async def refresh_forecast(self):
+        """Compute a fresh forecast off the event loop and publish it for the control tick"""
+        issued = self.twin.clock.now()
+        solar, load, scenarios = await self._in_executor(self.model_executor, self.twin.get_forecasts, issued)
+        prices = np.asarray(self.twin.price_forecast(issued, len(solar)))  # same hours as the forecast
+        self.forecast = (issued, solar, load, prices, scenarios)
+        self.stats['forecast_refreshes'] += 1
+
+    def current_forecast(self):
+        """Latest forecast (solar, load, prices, scenarios) with the hours elapsed since it was issued dropped"""
+        issued, solar, load, prices, scenarios = self.forecast
+        elapsed = max(0, int((self.twin.clock.now() - issued) / pd.Timedelta(hours=1)))
+        elapsed = min(elapsed, len(solar) - 1)
+        if scenarios is not None:
+            scenarios = (scenarios[0][:, elapsed:], scenarios[1][:, elapsed:])
+        return solar[elapsed:], load[elapsed:], prices[elapsed:], scenarios
+
+    async def ingest(self, observations):
+        """
+        Queue measured solar/load (DataFrame with 'solar'/'load' columns indexed by
+        timestamp) for the forecaster. Waits while the telemetry queue is full.
+        """
+        await self.telemetry.put(observations)
+        self.stats['max_telemetry_depth'] = max(self.stats['max_telemetry_depth'], self.telemetry.qsize())
+
+    async def _forecast_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.forecast_period)
+            except asyncio.TimeoutError:
+                await self.refresh_forecast()
+
+    async def _control_tick(self):
+        twin = self.twin
+        twin.apply_commands()
+        solar, load, prices, scenarios = self.current_forecast()
+        time_limit = twin.config['latency_budgets']['optimize']
+
+        optimize_start = time.perf_counter()
+        battery_setpoint, generator_setpoint = await self._in_executor(
+            self.solve_executor, twin.compute_setpoints,
+            solar, load, prices, scenarios, time_limit
+        )
+        optimize_time = time.perf_counter() - optimize_start
+
+        simulate_start = time.perf_counter()
+        new_state, record = twin.apply_setpoints(battery_setpoint, generator_setpoint)
+        simulate_time = time.perf_counter() - simulate_start
+        twin._record_timings(record['timestamp'], {'optimize': optimize_time, 'simulate': simulate_time})
+        twin.publish(record, solar, load, prices)
+
+        await self.ingest(pd.DataFrame({
+            'solar': [new_state['solar_power']],
+            'load': [new_state['load_power']]
+        }, index=[record['timestamp']]))
+        await self.records.put(record)
+        self.stats['max_record_depth'] = max(self.stats['max_record_depth'], self.records.qsize())
+        self.stats['ticks'] += 1
+
+    async def _control_loop(self, cycles):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while not self._stopping.is_set() and (cycles is None or self.stats['ticks'] < cycles):
+            tick_start = loop.time()
+            await self._control_tick()
+
+            # Keep the tick rate: an overrun skips to the next tick boundary
+            next_tick += self.control_period
+            now = loop.time()
+            if now > next_tick and self.control_period > 0:
+                self.twin.deadline_misses.append({
+                    'timestamp': self.twin.clock.now(),
+                    'stage': 'cycle',
+                    'latency': now - tick_start,
+                    'budget': self.control_period
+                })
+                next_tick += self.control_period * math.ceil((now - next_tick) / self.control_period)
+            await asyncio.sleep(max(0.0, next_tick - now))
+
+    async def _ingest_loop(self):
+        while True:
+            batch = [await self.telemetry.get()]
+            while len(batch) < self.ingest_batch and not self.telemetry.empty():
+                batch.append(self.telemetry.get_nowait())
+            try:
+                await self._in_executor(self.model_executor, self.twin.observe, pd.concat(batch))
+                self.stats['observations_ingested'] += sum(len(observations) for observations in batch)
+            except Exception as e:
+                print(f"Telemetry ingestion failed: {e}")
+            finally:
+                for _ in batch:
+                    self.telemetry.task_done()
+
+    async def _persist_loop(self):
+        while True:
+            record = await self.records.get()
+            try:
+                # Blocking disk I/O when the store seals a chunk: keep it off the event loop
+                await self._in_executor(None, self.twin.persist, record)
+                self.stats['records_persisted'] += 1
+            except Exception as e:
+                print(f"History persistence failed: {e}")
+            finally:
+                self.records.task_done()
+
+    def stop(self):
+        """Ask run() to finish: the control tick stops and the queues are drained"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self, cycles=None):
+        """Run until stop() is called (or for a number of control ticks)"""
+        self._stopping = asyncio.Event()
+        self.telemetry = asyncio.Queue(maxsize=self.queue_size)
+        self.records = asyncio.Queue(maxsize=self.queue_size)
+
+        await self.refresh_forecast()
+        consumers = [asyncio.create_task(self._ingest_loop()), asyncio.create_task(self._persist_loop())]
+        forecasting = asyncio.create_task(self._forecast_loop())
+        try:
+            await self._control_loop(cycles)
+        finally:
+            self._stopping.set()
+            await forecasting
+            await self.telemetry.join()
+            await self.records.join()
+            for task in consumers:
+                task.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+
+    def close(self):
+        """Shut down the executors"""
+        self.solve_executor.shutdown()
+        self.model_executor.shutdown()
@@ -0,0 +1,45 @@
+from types import MappingProxyType
+import numpy as np
+
+class Snapshot:
+    """
+    Immutable view of the twin at one instant: the latest state, the recent history
+    window (read-only column arrays, oldest first) and the sequence number of the last
+    record in it. Any number of readers can share a snapshot without locking.
+    """
+    __slots__ = ('sequence', 'state', 'history')
+
+    def __init__(self, sequence, state, history):
+        columns = {}
+        for name, values in history.items():
+            values = np.array(values)
+            values.flags.writeable = False
+            columns[name] = values
+        object.__setattr__(self, 'sequence', sequence)
+        object.__setattr__(self, 'state', MappingProxyType(dict(state)))
+        object.__setattr__(self, 'history', MappingProxyType(columns))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
+
+    def __len__(self):
+        return len(next(iter(self.history.values()), ()))
+
+    def tail(self, count):
+        """History columns of the last count records"""
+        return {name: values[len(values) - count:] for name, values in self.history.items()}
+
+class SnapshotPublisher:
+    """
+    Single-writer, many-reader hand-off of the latest Snapshot.
+    Publishing swaps one reference, so a reader never sees a half-written snapshot and
+    never blocks the writer.
+    """
+    def __init__(self, snapshot=None):
+        self._latest = snapshot
+
+    def publish(self, snapshot):
+        self._latest = snapshot
+
+    def latest(self):
+        return self._latest
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class SolutionCache:
+    """
+    Bounded LRU cache of dispatch plans keyed by quantized problem inputs.
+    Forecast and price vectors are rounded to a quantum and hashed together with the
+    solver parameters; the SOC is bucketed separately so neighbouring buckets can
+    seed a warm start when there is no exact hit.
+    """
+    def __init__(self, maxsize=1024, soc_step=0.5, power_quantum=0.01, price_quantum=0.001):
+        self.maxsize = maxsize
+        self.soc_step = soc_step  # %
+        self.power_quantum = power_quantum  # forecast units
+        self.price_quantum = price_quantum  # price units
+        self._entries = OrderedDict()  # (context digest, soc bucket) -> (battery_power, generator_power)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _quantize(self, values, quantum):
+        return np.round(np.asarray(values, dtype=float) / quantum).astype(np.int64).tobytes()
+
+    def key(self, solar_forecast, load_forecast, current_soc, electricity_prices, parameters=()):
+        """Cache key for a problem; parameters holds everything else the plan depends on"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self._quantize(solar_forecast, self.power_quantum))
+        digest.update(b'|')
+        digest.update(self._quantize(load_forecast, self.power_quantum))
+        digest.update(b'|')
+        digest.update(self._quantize(electricity_prices, self.price_quantum))
+        digest.update(repr(parameters).encode())
+        return digest.hexdigest(), int(round(current_soc / self.soc_step))
+
+    def get(self, key, valid=None):
+        """
+        Cached plan for key (counted as a hit or miss), or None. valid(plan) can reject a
+        plan that does not fit the exact problem, e.g. another SOC in the same bucket;
+        a rejected plan counts as a miss.
+        """
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is None or (valid is not None and not valid(plan)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def warm_start(self, key):
+        """Plan cached for an adjacent SOC bucket, as an initial guess, or None"""
+        context, bucket = key
+        with self._lock:
+            for neighbour in ((context, bucket - 1), (context, bucket + 1)):
+                plan = self._entries.get(neighbour)
+                if plan is not None:
+                    return np.concatenate(plan)
+        return None
+
+    def put(self, key, battery_power, generator_power):
+        """Store a plan, evicting the least recently used ones beyond maxsize"""
+        plan = (np.array(battery_power, dtype=float), np.array(generator_power, dtype=float))
+        for array in plan:
+            array.flags.writeable = False
+        with self._lock:
+            self._entries[key] = plan
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached plan (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,299 @@
+import json
+import os
+import queue
+import select
+import selectors
+import socket
+import stat
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+
+from history import RELIABILITY_STATES
+
+# Per-cycle values carried by every frame, besides the forecasts
+FRAME_FIELDS = ['battery_soc', 'solar_power', 'load_power', 'grid_power', 'battery_setpoint',
+                'generator_setpoint', 'total_cost_inr', 'carbon_emissions']
+FORECASTS = ['solar_forecast', 'load_forecast', 'price_forecast']
+
+HEADER_BYTES = 64  # int64 count of frames ever published, padded to a cache line
+
+# Segments created by buses in this process (their subscribers must leave the tracking alone)
+_owned = set()
+
+def frame_dtype(horizon):
+    """Layout of one ring slot; forecasts are stored up to `horizon` steps"""
+    fields = [('sequence', np.int64),  # frame number once complete, -1 while being written
+              ('timestamp', np.int64)]  # ns
+    fields += [(name, np.float64) for name in FRAME_FIELDS]
+    fields += [('reliability_status', np.int32),  # index into the hello's 'states', -1 if unknown
+               ('forecast_length', np.int32)]
+    fields += [(name, np.float64, (horizon,)) for name in FORECASTS]
+    return np.dtype(fields, align=True)
+
+def _attach(name):
+    """
+    Attach to a segment owned (and unlinked) by the publisher. Before Python 3.13 attaching
+    registers the segment with this process's resource tracker, which would unlink it when
+    we exit, so the registration is undone (unless the publisher is in this process too).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if name not in _owned:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+class TelemetryBus:
+    """
+    Local pub/sub channel from one twin process to any number of dashboards or consumers.
+
+    Frames (state, setpoints and forecasts of one cycle) go into a shared memory ring of
+    `slots` entries, each guarded by a sequence number so readers can detect a slot the
+    writer is overwriting. A Unix socket at `path` carries everything else: on connect a
+    subscriber gets one JSON line describing the ring, then one wake-up byte per published
+    frame; subscribers send commands back as JSON lines, which the twin drains with
+    commands(). A subscriber that stops reading only misses wake-ups, never frames that
+    are still in the ring, and never slows the publisher.
+    """
+    def __init__(self, path, slots=4096, horizon=48):
+        self.path = path
+        self.slots = slots
+        self.horizon = horizon
+        self.dtype = frame_dtype(horizon)
+        self.states = list(RELIABILITY_STATES)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + slots * self.dtype.itemsize)
+        _owned.add(self._shm.name)
+        self._header = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots,), dtype=self.dtype, buffer=self._shm.buf, offset=HEADER_BYTES)
+        self._header[0] = 0
+        self._frames['sequence'] = -1
+
+        # A socket left behind by a publisher that died is replaced; anything else is an error
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.unlink(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+        self._server.setblocking(False)
+
+        self._commands = queue.SimpleQueue()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._serve, name='telemetry-bus', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def published(self):
+        """Number of frames published so far"""
+        return int(self._header[0])
+
+    def _hello(self):
+        return {'shm': self._shm.name, 'slots': self.slots, 'horizon': self.horizon, 'states': self.states}
+
+    def _serve(self):
+        """Accept subscribers and collect their commands"""
+        while not self._closing.is_set():
+            for key, _ in self._selector.select(timeout=0.5):
+                if key.fileobj is self._server:
+                    self._accept()
+                else:
+                    self._receive(key.fileobj, key.data)
+
+    def _accept(self):
+        try:
+            connection, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(True)
+        connection.sendall((json.dumps(self._hello()) + '\n').encode())
+        connection.setblocking(False)
+        self._selector.register(connection, selectors.EVENT_READ, data=bytearray())
+        with self._lock:
+            self._connections.add(connection)
+
+    def _receive(self, connection, buffer):
+        try:
+            data = connection.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(connection)
+            with self._lock:
+                self._connections.discard(connection)
+            connection.close()
+            return
+
+        buffer.extend(data)
+        *lines, rest = buffer.split(b'\n')
+        buffer[:] = rest
+        for line in lines:
+            try:
+                self._commands.put(json.loads(line))
+            except ValueError:
+                print(f"Ignoring malformed telemetry command: {line[:80]!r}")
+
+    def publish(self, record, solar_forecast=None, load_forecast=None, price_forecast=None):
+        """Write one cycle's record (a history row) and forecasts to the ring and wake subscribers"""
+        sequence = self.published
+        slot = self._frames[sequence % self.slots:sequence % self.slots + 1]
+
+        slot['sequence'] = -1
+        slot['timestamp'] = pd.Timestamp(record['timestamp']).value
+        for name in FRAME_FIELDS:
+            slot[name] = record[name]
+        status = record.get('reliability_status')
+        slot['reliability_status'] = self.states.index(status) if status in self.states else -1
+
+        forecasts = dict(zip(FORECASTS, (solar_forecast, load_forecast, price_forecast)))
+        length = min((len(values) for values in forecasts.values() if values is not None), default=0)
+        length = min(length, self.horizon)
+        slot['forecast_length'] = length
+        for name, values in forecasts.items():
+            slot[name] = np.nan
+            if values is not None:
+                slot[name][0, :length] = np.asarray(values, dtype=float)[:length]
+
+        slot['sequence'] = sequence
+        self._header[0] = sequence + 1
+
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.send(b'.')
+            except BlockingIOError:
+                pass  # a wake-up is already pending
+            except OSError:
+                pass  # gone; the serving thread drops it
+
+    def commands(self):
+        """Commands received since the last call, oldest first"""
+        received = []
+        while True:
+            try:
+                received.append(self._commands.get_nowait())
+            except queue.Empty:
+                return received
+
+    def close(self):
+        """Disconnect subscribers and release the socket and shared memory"""
+        if self._closing.is_set():
+            return
+        self._closing.set()
+        self._thread.join()
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._selector.close()
+        self._server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        del self._header, self._frames
+        self._shm.close()
+        self._shm.unlink()
+        _owned.discard(self._shm.name)
+
+class TelemetrySubscriber:
+    """
+    Reader side of a TelemetryBus. view() exposes a slot of the shared ring without
+    copying (valid until the publisher laps the ring); read() copies one frame out and
+    checks that it was not overwritten meanwhile.
+    """
+    def __init__(self, path, timeout=5.0):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path)
+
+        buffer = b''
+        while b'\n' not in buffer:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError(f"Telemetry bus at {path} closed during handshake")
+            buffer += data
+        hello = json.loads(buffer.split(b'\n', 1)[0])  # anything after it is wake-ups
+        self.socket.settimeout(None)
+
+        self.slots = hello['slots']
+        self.horizon = hello['horizon']
+        self.states = hello['states']
+        self.dtype = frame_dtype(self.horizon)
+        self._shm = _attach(hello['shm'])
+        self._header = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((self.slots,), dtype=self.dtype, buffer=self._shm.buf, offset=HEADER_BYTES)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def published(self):
+        """Number of frames the publisher has written so far"""
+        return int(self._header[0])
+
+    def view(self, sequence):
+        """Zero-copy one-element view of frame `sequence`, or None if it is not in the ring"""
+        slot = self._frames[sequence % self.slots:sequence % self.slots + 1]
+        return slot if slot['sequence'][0] == sequence else None
+
+    def read(self, sequence):
+        """Frame `sequence` as a dict (forecasts trimmed to their length), or None if it is gone"""
+        slot = self.view(sequence)
+        if slot is None:
+            return None
+        frame = slot.copy()[0]
+        if slot['sequence'][0] != sequence:
+            return None  # overwritten while copying
+
+        length = int(frame['forecast_length'])
+        status = int(frame['reliability_status'])
+        record = {'sequence': sequence, 'timestamp': pd.Timestamp(int(frame['timestamp']))}
+        record.update({name: float(frame[name]) for name in FRAME_FIELDS})
+        record['reliability_status'] = self.states[status] if status >= 0 else None
+        record.update({name: frame[name][:length] for name in FORECASTS})
+        return record
+
+    def since(self, after):
+        """Frames after..published - 1 still in the ring, oldest first"""
+        published = self.published
+        frames = (self.read(sequence) for sequence in range(max(after, published - self.slots), published))
+        return [frame for frame in frames if frame is not None]
+
+    def latest(self):
+        published = self.published
+        return self.read(published - 1) if published else None
+
+    def wait(self, timeout=None):
+        """Block until the publisher signals a new frame (or timeout); returns published"""
+        readable, _, _ = select.select([self.socket], [], [], timeout)
+        if readable and not self.socket.recv(65536):
+            raise ConnectionError("Telemetry bus closed")
+        return self.published
+
+    def send(self, command, **args):
+        """Send a command to the publishing twin, e.g. send('inject_disturbance', solar_reduction=60)"""
+        self.socket.sendall((json.dumps({'command': command, 'args': args}) + '\n').encode())
+
+    def close(self):
+        self.socket.close()
+        del self._header, self._frames
+        self._shm.close()
@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from history import HistoryBuffer, TWIN_SCHEMA
+
+class TelemetryStore:
+    """
+    Durable append-only history made of bounded-size columnar chunks.
+    Each sealed chunk is a directory of per-column .npy files plus meta.json with its
+    time range; it is written under a temporary name and atomically renamed, so readers
+    in other processes only ever see complete chunks. Queries memory-map just the chunks
+    overlapping the requested time range, keeping RAM use independent of history length.
+    A chunk is sealed once it holds chunk_size rows or, with a flush_interval, once its
+    rows span that many seconds, which bounds what a crash loses at slow cycle rates.
+    """
+    def __init__(self, path, chunk_size=86400, schema=None, readonly=False, flush_interval=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval  # s of record time
+        self.schema = dict(TWIN_SCHEMA if schema is None else schema)
+        self.readonly = readonly
+        self._meta_cache = {}
+        os.makedirs(path, exist_ok=True)
+
+        # Rows not yet sealed into a chunk (only visible to this process);
+        # categorical codes continue from the chunks already on disk
+        self.active = None
+        self.last_timestamp = None  # ns of the newest stored row; appends must be strictly later
+        if not readonly:
+            chunks = self.chunks()
+            categories = chunks[-1][1]['categories'] if chunks else None
+            self.active = HistoryBuffer(capacity=chunk_size, schema=self.schema, categories=categories)
+            if chunks:
+                self.last_timestamp = chunks[-1][1]['end']
+
+    def append(self, record):
+        """
+        Add one row; the active chunk is sealed to disk once it is full or flush_interval old.
+        Rows must be strictly newer than the stored history (e.g. a restarted simulation
+        replaying old timestamps), otherwise ValueError is raised and nothing is stored.
+        """
+        if self.readonly:
+            raise ValueError("TelemetryStore opened read-only")
+        timestamp = pd.Timestamp(record['timestamp']).value
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            raise ValueError(f"Row at {pd.Timestamp(timestamp)} is not after the stored history "
+                             f"(ends {pd.Timestamp(self.last_timestamp)})")
+        self.active.append(record)
+        self.last_timestamp = timestamp
+        if len(self.active) >= self.chunk_size or self._flush_due(record['timestamp']):
+            self.flush()
+
+    def _flush_due(self, timestamp):
+        """Whether the active chunk spans flush_interval seconds up to timestamp"""
+        if self.flush_interval is None:
+            return False
+        first = pd.Timestamp(self.active.column('timestamp')[0])
+        return (pd.Timestamp(timestamp) - first).total_seconds() >= self.flush_interval
+
+    def flush(self):
+        """Seal the rows buffered so far into a chunk on disk"""
+        if self.readonly or self.active.empty:
+            return
+        timestamps = self.active.column('timestamp').astype('datetime64[ns]').astype(np.int64)
+
+        # Named by time range (sorting by name keeps chunks in time order), with a counter
+        # in case a chunk of that range was left by another writer
+        base = name = f"{timestamps[0]:020d}-{timestamps[-1]:020d}"
+        counter = 0
+        while os.path.exists(os.path.join(self.path, name)):
+            counter += 1
+            name = f"{base}-{counter}"
+        tmp_dir = os.path.join(self.path, f".tmp-{name}")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        try:
+            for column in self.schema:
+                np.save(os.path.join(tmp_dir, f"{column}.npy"), self.active.column(column))
+
+            meta = {
+                'rows': len(self.active),
+                'start': int(timestamps[0]),
+                'end': int(timestamps[-1]),
+                'categories': {column: list(values) for column, values in self.active.categories.items()}
+            }
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+
+            os.replace(tmp_dir, os.path.join(self.path, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # nothing left once renamed
+        self.active.clear()
+
+    def chunks(self):
+        """Sorted (directory, meta) pairs of every sealed chunk"""
+        chunks = []
+        for name in sorted(os.listdir(self.path)):
+            if name.startswith('.'):
+                continue
+            if name not in self._meta_cache:
+                with open(os.path.join(self.path, name, 'meta.json')) as f:
+                    self._meta_cache[name] = json.load(f)
+            chunks.append((os.path.join(self.path, name), self._meta_cache[name]))
+        return chunks
+
+    def categories(self):
+        """
+        Newest category list per categorical column. Categories are only ever appended,
+        so older chunks decode correctly with it and concatenated frames stay categorical.
+        """
+        if self.active is not None:
+            return self.active.categories
+        chunks = self.chunks()
+        return chunks[-1][1]['categories'] if chunks else {}
+
+    def _read_chunk(self, directory, meta, start_ns, end_ns, columns):
+        """Rows of one chunk within [start_ns, end_ns], reading only the pages needed"""
+        timestamps = np.load(os.path.join(directory, 'timestamp.npy'), mmap_mode='r').view(np.int64)
+        lo = np.searchsorted(timestamps, start_ns, side='left')
+        hi = np.searchsorted(timestamps, end_ns, side='right')
+        if lo >= hi:
+            return None
+
+        categories = self.categories()
+        data = {}
+        for column in columns:
+            values = np.array(np.load(os.path.join(directory, f"{column}.npy"), mmap_mode='r')[lo:hi])
+            if column in categories:
+                values = pd.Categorical.from_codes(values, categories=categories[column])
+            data[column] = values
+        return pd.DataFrame(data)
+
+    def query(self, start=None, end=None, columns=None):
+        """History rows with start <= timestamp <= end, oldest first"""
+        start_ns = np.iinfo(np.int64).min if start is None else pd.Timestamp(start).value
+        end_ns = np.iinfo(np.int64).max if end is None else pd.Timestamp(end).value
+        columns = list(self.schema) if columns is None else ['timestamp'] + [c for c in columns if c != 'timestamp']
+
+        frames = []
+        for directory, meta in self.chunks():
+            if meta['end'] < start_ns or meta['start'] > end_ns:
+                continue
+            frame = self._read_chunk(directory, meta, start_ns, end_ns, columns)
+            if frame is not None:
+                frames.append(frame)
+
+        # Rows still buffered by this writer
+        if self.active is not None and not self.active.empty:
+            frame = self.active.to_frame()[columns]
+            timestamps = self.active.column('timestamp').view(np.int64)
+            frames.append(frame[(timestamps >= start_ns) & (timestamps <= end_ns)].copy())
+
+        if not frames:
+            return self._empty_frame(columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def tail(self, rows):
+        """The most recent rows, reading chunks backwards only as far as needed"""
+        frames = []
+        remaining = rows
+        if self.active is not None and not self.active.empty:
+            frames.append(self.active.to_frame().tail(remaining).copy())
+            remaining -= len(frames[0])
+
+        for directory, meta in reversed(self.chunks()):
+            if remaining <= 0:
+                break
+            frame = self._read_chunk(directory, meta, meta['start'], meta['end'], list(self.schema))
+            frames.insert(0, frame.tail(remaining))
+            remaining -= len(frames[0])
+
+        if not frames:
+            return self._empty_frame(list(self.schema))
+        return pd.concat(frames, ignore_index=True)
+
+    def _empty_frame(self, columns):
+        return pd.DataFrame({column: pd.Series(dtype=self.schema[column]) for column in columns})
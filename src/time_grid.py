@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+class TimeGrid:
+    """
+    Planning horizon made of variable-length periods, e.g. 5-minute steps for the
+    first hour, 15-minute steps for the next six and hourly steps after that:
+
+        TimeGrid([('5min', '1h'), ('15min', '6h'), ('60min', '17h')])
+
+    Each segment is (step length, span); spans must be whole multiples of their step.
+    Pass `steps` (hours per period) as step_hours to the optimizer.
+    """
+    def __init__(self, segments):
+        steps = []
+        for step, span in segments:
+            step, span = pd.Timedelta(step), pd.Timedelta(span)
+            if span % step:
+                raise ValueError(f"Span {span} is not a whole number of {step} steps")
+            steps.extend([step.value] * (span // step))
+
+        self.segments = list(segments)
+        self.offsets = pd.to_timedelta(np.concatenate([[0], np.cumsum(steps)]))  # exact period edges
+        self.steps = np.array(steps) / pd.Timedelta(hours=1).value  # hours per period
+        self.boundaries = self.offsets.values.astype(np.int64) / pd.Timedelta(hours=1).value  # hours
+        self.steps.flags.writeable = False
+        self.boundaries.flags.writeable = False
+
+    @classmethod
+    def uniform(cls, step='15min', horizon='24h'):
+        """Grid of equal periods"""
+        return cls([(step, horizon)])
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def horizon_hours(self):
+        return float(self.boundaries[-1])
+
+    def timestamps(self, start):
+        """Start time of every period"""
+        return pd.Timestamp(start) + self.offsets[:-1]
+
+    def resample(self, values, step_hours=1.0):
+        """
+        Average a series of equal steps (step_hours each, e.g. an hourly forecast or tariff)
+        over every grid period. Values are treated as constant within their step, and the
+        last value is held beyond the end of the series. Works along the last axis, so a
+        (scenarios, steps) array is resampled in one call.
+        """
+        values = np.asarray(values, dtype=float)
+        n_source = values.shape[-1]
+        source_end = n_source * step_hours
+
+        # Integral of the step function at each grid boundary, by interpolation on its knots
+        integral = np.concatenate([np.zeros(values.shape[:-1] + (1,)),
+                                   np.cumsum(values, axis=-1) * step_hours], axis=-1)
+        inside = np.minimum(self.boundaries, source_end)
+        index = np.minimum((inside // step_hours).astype(int), n_source - 1)
+        area = (integral[..., index] + (inside - index * step_hours) * values[..., index] +
+                (self.boundaries - inside) * values[..., -1:])
+
+        return np.diff(area, axis=-1) / self.steps